@@ -1,23 +1,142 @@
+import hashlib
 import json
+import threading
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, selectinload
+from catalog import Catalog
 import models
 
 def load_data():
     """
-    Load data from a JSON file.
+    Load data from a JSON file into an indexed Catalog.
     """
     current_file_dir = Path(__file__).parent
     data_file_path = current_file_dir / 'datas.json'
 
     with open(data_file_path, 'r') as file:
         data = json.load(file)
-    return data
+    return Catalog(data)
 
 
-def get_teachers(db: Session):
+# Catalogue chargé au premier usage, partagé par toutes les requêtes
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """
+    The Catalog of datas.json, loaded once on first use.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_data()
+    return _catalog
+
+
+async def get_teachers(db: AsyncSession, after_id: int = None, limit: int = 100, include_subjects: bool = False):
+    """
+    Get one page of teachers from the bdd, ordered by id.
+    - after_id: id of the last teacher of the previous page (keyset pagination)
+    - include_subjects: also load the subjects of each teacher, in one extra query
+    Only the served columns are read, the result is made of plain dicts.
+    """
+    if include_subjects:
+        query = select(models.Teacher).options(
+            load_only(models.Teacher.id, models.Teacher.first_name, models.Teacher.last_name, models.Teacher.email),
+            selectinload(models.Teacher.subjects).load_only(
+                models.Subject.id, models.Subject.name, models.Subject.semester, models.Subject.class_id),
+        )
+    else:
+        query = select(models.Teacher.id, models.Teacher.first_name, models.Teacher.last_name, models.Teacher.email)
+    if after_id is not None:
+        query = query.where(models.Teacher.id > after_id)
+    result = await db.execute(query.order_by(models.Teacher.id).limit(limit))
+    rows = result.scalars().all() if include_subjects else result.all()
+
+    teachers = []
+    for row in rows:
+        teacher = {"id": row.id, "first_name": row.first_name, "last_name": row.last_name, "email": row.email}
+        if include_subjects:
+            teacher["subjects"] = [
+                {"id": subject.id, "name": subject.name, "semester": subject.semester, "class_id": subject.class_id}
+                for subject in row.subjects
+            ]
+        teachers.append(teacher)
+    return teachers
+
+
+def hash_planning_data(planning_data: models.PlanningData):
+    """
+    Canonical hash of the solver inputs of a planning_data.
+    Rooms and class name do not change the solver output and are left out,
+    unavailable periods are compared as sets.
+    """
+    params = planning_data.params
+    canonical = {
+        "params": [params.slots_per_day, params.days_per_week, params.max_hours_per_week, params.algorithm,
+                   params.max_iterations, params.time_budget_ms, params.portfolio_deadline_ms],
+        "subjects": [
+            [subject.name, subject.hours_todo, subject.hours_done, subject.hours_total,
+             sorted(set(subject.unavailable_periods))]
+            for subject in planning_data.subjects
+        ],
+    }
+    payload = json.dumps(canonical, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+
+def save_planning(db: Session, planning_data: models.PlanningData, input_hash: str, planning):
+    """
+    Store a generated planning for its class and week.
+    A new row is only added when the planning differs from the one already
+    stored for the same inputs.
+    """
+    params = planning_data.params
+    stored = (
+        db.query(models.Planning)
+        .filter(models.Planning.class_name == params.class_name,
+                models.Planning.week_number == params.week_number,
+                models.Planning.algorithm == params.algorithm,
+                models.Planning.input_hash == input_hash)
+        .order_by(models.Planning.id.desc())
+        .first()
+    )
+    if stored is not None and stored.planning == planning:
+        return stored
+
+    stored = models.Planning(
+        class_name=params.class_name,
+        week_number=params.week_number,
+        algorithm=params.algorithm,
+        input_hash=input_hash,
+        planning=planning,
+    )
+    db.add(stored)
+    db.commit()
+    return stored
+
+
+async def get_planning_version(db: AsyncSession, class_name: str, week_number: int, algorithm: str = None):
+    """
+    Get the id and input hash of the latest planning stored for a class and week,
+    without loading the planning itself.
+    """
+    query = select(models.Planning.id, models.Planning.input_hash).where(
+        models.Planning.class_name == class_name,
+        models.Planning.week_number == week_number,
+    )
+    if algorithm:
+        query = query.where(models.Planning.algorithm == algorithm)
+    result = await db.execute(query.order_by(models.Planning.id.desc()).limit(1))
+    return result.first()
+
+
+async def get_planning(db: AsyncSession, planning_id: int):
     """
-    Get the list of teachers from the bdd.
+    Get a stored planning by id.
     """
-    data = db.query(models.Teacher).all()  # Assuming you want to fetch all teachers
-    return data
\ No newline at end of file
+    return await db.get(models.Planning, planning_id)
@@ -0,0 +1,249 @@
+"""
+Benchmark des solveurs Rust et de l'endpoint /generate_planning.
+
+Génère des PlanningData synthétiques sur une grille de tailles et mesure :
+- le marshalling Python (conversion des listes en buffers) seul,
+- l'appel complet au solveur via Rustml (marshalling + appel natif),
+- l'endpoint /generate_planning en process (validation, solveur, mise en forme).
+
+Les résultats sont écrits en JSON pour comparer les exécutions :
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+La comparaison sort en erreur si une mesure régresse au-delà du seuil.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import models
+from rustml_wrapper import Rustml
+
+SLOT_MINUTES = 90
+SOLVERS = ("greedy", "greedy_mc", "min_conflicts")
+
+
+def make_planning_data(slots_per_day: int, days_per_week: int, subjects_len: int, density: float,
+                       algorithm: str = "greedy", seed: int = 0):
+    """
+    Synthetic class: `subjects_len` subjects, each unavailable on about
+    `density` of the week's slots.
+    """
+    rng = random.Random(seed)
+    total_slots = slots_per_day * days_per_week
+    subjects = []
+    for i in range(subjects_len):
+        hours_total = rng.choice([15.0, 30.0, 45.0, 60.0])
+        subjects.append(models.InputSubject(
+            name=f"Subject {i}",
+            teacher=f"Teacher {i % max(subjects_len // 2, 1)}",
+            hours_todo=rng.choice([1.5, 3.0, 4.5, 6.0]),
+            hours_done=float(rng.randrange(0, int(hours_total))),
+            hours_total=hours_total,
+            unavailable_periods=sorted(rng.sample(range(total_slots), int(total_slots * density))),
+        ))
+    return models.PlanningData(
+        params=models.Params(
+            class_name=f"bench-{slots_per_day}x{days_per_week}-{subjects_len}-{density}",
+            slots_per_day=slots_per_day,
+            days_per_week=days_per_week,
+            max_hours_per_week=35,
+            algorithm=algorithm,
+        ),
+        subjects=subjects,
+        rooms=[models.Room(name="Salle 1", capacity=30)],
+    )
+
+
+def solver_inputs(planning_data: models.PlanningData):
+    return {
+        "total_slots": planning_data.params.slots_per_day * planning_data.params.days_per_week,
+        "subjects": list(range(len(planning_data.subjects))),
+        "todo": [subject.hours_todo for subject in planning_data.subjects],
+        "dones": [subject.hours_done for subject in planning_data.subjects],
+        "total": [subject.hours_total for subject in planning_data.subjects],
+        "unavailability": [subject.unavailable_periods for subject in planning_data.subjects],
+    }
+
+
+def call_solver(rustml: Rustml, solver: str, inputs: dict, max_hours: int, time_budget_ms: int):
+    if solver == "greedy":
+        return rustml.generate_greedy_planning(
+            total_slots=inputs["total_slots"], max_hours=max_hours, slot_minutes=SLOT_MINUTES,
+            subjects=inputs["subjects"], todo=inputs["todo"], unavailability=inputs["unavailability"])
+    if solver == "min_conflicts":
+        return rustml.generate_min_conflicts_planning(
+            total_slots=inputs["total_slots"], slot_minutes=SLOT_MINUTES,
+            subjects=inputs["subjects"], todo=inputs["todo"], unavailability=inputs["unavailability"],
+            time_budget_ms=time_budget_ms)
+    return rustml.generate_greedy_mc_planning(
+        total_slots=inputs["total_slots"], max_weekly_hours=max_hours, slot_minutes=SLOT_MINUTES,
+        subjects=inputs["subjects"], unavailability=inputs["unavailability"],
+        hours_done=inputs["dones"], all_hours=inputs["total"])
+
+
+def marshal(rustml: Rustml, solver: str, inputs: dict):
+    """
+    The Python side of a solver call, without the native call.
+    """
+    rustml.marshal_floats("subjects", inputs["subjects"])
+    if solver == "greedy_mc":
+        rustml.marshal_floats("hours_done", inputs["dones"])
+        rustml.marshal_floats("all_hours", inputs["total"])
+    else:
+        rustml.marshal_floats("todo", inputs["todo"])
+    rustml.marshal_unavailability_bits(inputs["unavailability"], inputs["total_slots"])
+
+
+def timed(func, repeat: int):
+    """
+    Run func `repeat` times, return the median and min duration in ms.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(durations), 4), "min_ms": round(min(durations), 4)}
+
+
+def bench_solvers(rustml: Rustml, cases, solvers, repeat: int, time_budget_ms: int):
+    results = []
+    for slots_per_day, days_per_week, subjects_len, density in cases:
+        planning_data = make_planning_data(slots_per_day, days_per_week, subjects_len, density)
+        inputs = solver_inputs(planning_data)
+        max_hours = planning_data.params.max_hours_per_week
+        for solver in solvers:
+            marshal_time = timed(lambda: marshal(rustml, solver, inputs), repeat)
+            total_time = timed(lambda: call_solver(rustml, solver, inputs, max_hours, time_budget_ms), repeat)
+            result = {
+                "kind": "solver",
+                "solver": solver,
+                "slots_per_day": slots_per_day,
+                "days_per_week": days_per_week,
+                "subjects": subjects_len,
+                "density": density,
+                "marshal": marshal_time,
+                "total": total_time,
+                # Appel natif estimé : appel complet moins le marshalling seul
+                "native_ms": round(max(total_time["median_ms"] - marshal_time["median_ms"], 0), 4),
+            }
+            results.append(result)
+            print(f"{solver:>13} {slots_per_day}x{days_per_week} subjects={subjects_len:<4} density={density:<4} "
+                  f"marshal={marshal_time['median_ms']:.3f}ms total={total_time['median_ms']:.3f}ms")
+    return results
+
+
+def bench_api(cases, solvers, repeat: int, time_budget_ms: int):
+    """
+    /generate_planning in process, cache bypassed so every call reaches the solver.
+    Needs httpx (TestClient) but no database: without week_number nothing is stored.
+    """
+    try:
+        from fastapi.testclient import TestClient
+        import main
+    except Exception as e:
+        print(f"API benchmark skipped: {e}")
+        return []
+
+    client = TestClient(main.app)
+    results = []
+    for slots_per_day, days_per_week, subjects_len, density in cases:
+        for solver in solvers:
+            planning_data = make_planning_data(slots_per_day, days_per_week, subjects_len, density, algorithm=solver)
+            planning_data.params.time_budget_ms = time_budget_ms
+            body = planning_data.model_dump()
+
+            def call():
+                response = client.post("/generate_planning", json=body, headers={"Cache-Control": "no-cache"})
+                response.raise_for_status()
+
+            total_time = timed(call, repeat)
+            results.append({
+                "kind": "api",
+                "solver": solver,
+                "slots_per_day": slots_per_day,
+                "days_per_week": days_per_week,
+                "subjects": subjects_len,
+                "density": density,
+                "total": total_time,
+            })
+            print(f"{'api ' + solver:>17} {slots_per_day}x{days_per_week} subjects={subjects_len:<4} density={density:<4} "
+                  f"total={total_time['median_ms']:.3f}ms")
+    return results
+
+
+def result_key(result: dict):
+    return (result["kind"], result["solver"], result["slots_per_day"], result["days_per_week"],
+            result["subjects"], result["density"])
+
+
+def compare(results, baseline_path: str, threshold: float, noise_ms: float):
+    """
+    Print the measures slower than `threshold` times the baseline (and by more
+    than `noise_ms`). Returns the number of regressions.
+    """
+    with open(baseline_path, "r") as file:
+        baseline = {result_key(result): result for result in json.load(file)["results"]}
+
+    regressions = 0
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        new_ms, old_ms = result["total"]["median_ms"], old["total"]["median_ms"]
+        if new_ms > old_ms * threshold and new_ms - old_ms > noise_ms:
+            regressions += 1
+            print(f"REGRESSION {result_key(result)}: {old_ms:.3f}ms -> {new_ms:.3f}ms")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the planning solvers.")
+    parser.add_argument("--slots-per-day", type=int, nargs="+", default=[5, 8])
+    parser.add_argument("--days-per-week", type=int, nargs="+", default=[5, 6])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[5, 20, 50, 200])
+    parser.add_argument("--density", type=float, nargs="+", default=[0.0, 0.1, 0.3])
+    parser.add_argument("--solvers", nargs="+", choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-budget-ms", type=int, default=1000,
+                        help="time budget of min_conflicts (0: no limit)")
+    parser.add_argument("--api", action="store_true", help="also benchmark /generate_planning")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="baseline JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--noise-ms", type=float, default=0.5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cases = list(itertools.product(args.slots_per_day, args.days_per_week, args.subjects, args.density))
+
+    rustml = Rustml()
+    results = bench_solvers(rustml, cases, args.solvers, args.repeat, args.time_budget_ms)
+    if args.api:
+        results += bench_api(cases, args.solvers, args.repeat, args.time_budget_ms)
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "time_budget_ms": args.time_budget_ms,
+            },
+            "results": results,
+        }, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold, args.noise_ms):
+        sys.exit(1)
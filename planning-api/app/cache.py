@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from settings import settings
+
+
+class PlanningCache:
+    """
+    LRU cache with time-to-live for the solver results.
+    Keys are the canonical hash of a PlanningData (see basic_function.hash_planning_data).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        Return the cached value for key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value):
+        """
+        Store value for key, evicting the least recently used entry if full.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+planning_cache = PlanningCache(max_size=settings.CACHE_MAX_SIZE, ttl=settings.CACHE_TTL_SECONDS)
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls with the same key share one run of
+    their function. Nothing is kept once the run is over, a later call runs
+    again (the PlanningCache is what keeps results).
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func):
+        """
+        Run func, or wait for the run of the same key already in flight.
+        Returns its result (or raises its exception) and True if it was shared.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+                self.runs += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return flight.result(), True
+        try:
+            flight.set_result(func())
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return flight.result(), False
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "runs": self.runs, "shared": self.shared}
+
+
+planning_flights = SingleFlight()
+
+
+class VersionedCache:
+    """
+    LRU cache with time-to-live for read-mostly database results.
+    Every entry is tagged with the version counter at the time it was read:
+    bump() invalidates all the entries at once, after a write made by this
+    process. Writes bump() cannot see (another worker, the importer.py CLI,
+    any other database client) are picked up once the entries expire.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self.version and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, version: int):
+        """
+        Store value for key, read at `version`.
+        Values read before the last bump() are dropped.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+teacher_cache = VersionedCache(max_size=settings.TEACHER_CACHE_MAX_SIZE, ttl=settings.TEACHER_CACHE_TTL_SECONDS)
@@ -0,0 +1,110 @@
+import threading
+from collections import defaultdict
+
+
+def _copy_subject(subject: dict):
+    # The unavailable periods list is the only mutable field shared with the catalog
+    return dict(subject, unavailable_periods=list(subject.get("unavailable_periods", [])))
+
+
+class Catalog:
+    """
+    In-memory catalog of the planning data (params, subjects and rooms).
+    Subjects are indexed by name and by teacher, rooms by name, and the indexes
+    are kept up to date by the update methods. All access goes through a lock,
+    read methods return copies that callers can use freely.
+    """
+
+    def __init__(self, data: dict):
+        self._lock = threading.RLock()
+        self._params = dict(data.get("params", {}))
+        self._subjects = []
+        self._rooms = []
+        self._subjects_by_name = defaultdict(list)
+        self._subjects_by_teacher = defaultdict(list)
+        self._rooms_by_name = defaultdict(list)
+        self._teacher_labels = []
+        for subject in data.get("subjects", []):
+            self._add_subject(subject)
+        for room in data.get("rooms", []):
+            self._add_room(room)
+
+    # --- Index maintenance ---
+
+    def _add_subject(self, subject: dict):
+        subject = _copy_subject(subject)
+        self._subjects.append(subject)
+        self._subjects_by_name[subject["name"]].append(subject)
+        self._subjects_by_teacher[subject["teacher"]].append(subject)
+        self._teacher_labels.append(subject["teacher"] + " - " + subject["name"])
+
+    def _add_room(self, room: dict):
+        room = dict(room)
+        self._rooms.append(room)
+        self._rooms_by_name[room["name"]].append(room)
+
+    def _subjects_for(self, name: str):
+        """
+        Subjects whose name or teacher is `name`, each subject once.
+        """
+        matches = {id(subject): subject for subject in self._subjects_by_name.get(name, [])}
+        for subject in self._subjects_by_teacher.get(name, []):
+            matches[id(subject)] = subject
+        return list(matches.values())
+
+    # --- Read ---
+
+    def params(self):
+        with self._lock:
+            return dict(self._params)
+
+    def subjects(self):
+        with self._lock:
+            return [_copy_subject(subject) for subject in self._subjects]
+
+    def subjects_by_name(self, name: str):
+        with self._lock:
+            return [_copy_subject(subject) for subject in self._subjects_by_name.get(name, [])]
+
+    def subjects_by_teacher(self, teacher: str):
+        with self._lock:
+            return [_copy_subject(subject) for subject in self._subjects_by_teacher.get(teacher, [])]
+
+    def teacher_labels(self):
+        """
+        "teacher - subject" label of every subject.
+        """
+        with self._lock:
+            return list(self._teacher_labels)
+
+    def rooms(self):
+        with self._lock:
+            return [dict(room) for room in self._rooms]
+
+    def rooms_by_name(self, name: str):
+        with self._lock:
+            return [dict(room) for room in self._rooms_by_name.get(name, [])]
+
+    # --- Update ---
+
+    def remove_hours_todo(self, name: str, hours: float):
+        """
+        Remove `hours` from hours_todo of the subjects named `name`.
+        Returns the number of subjects updated.
+        """
+        with self._lock:
+            subjects = self._subjects_by_name.get(name, [])
+            for subject in subjects:
+                subject["hours_todo"] -= hours
+            return len(subjects)
+
+    def add_unavailable(self, name: str, slots: list[int]):
+        """
+        Add unavailable slots to the subjects whose name or teacher is `name`.
+        Returns the number of subjects updated.
+        """
+        with self._lock:
+            subjects = self._subjects_for(name)
+            for subject in subjects:
+                subject["unavailable_periods"].extend(slots)
+            return len(subjects)
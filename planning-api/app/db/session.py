@@ -1,10 +1,105 @@
+import threading
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from settings import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# Drivers asynchrones utilisés quand ASYNC_DATABASE_URL n'est pas renseignée
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def engine_options(url: str):
+    """
+    Pool settings of an engine. SQLite uses its own pools, without size or overflow.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+def async_database_url():
+    """
+    ASYNC_DATABASE_URL, or DATABASE_URL with its async driver
+    (postgresql -> asyncpg, sqlite -> aiosqlite).
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS.get(backend, url.get_driver_name())}") \
+        .render_as_string(hide_password=False)
+
+
+# Moteurs créés au premier usage : un worker qui ne touche pas à la base
+# (ou démarré sans DATABASE_URL) n'ouvre aucune connexion
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def _database(kind: str):
+    """
+    Engine and session factory of `kind` ("sync" or "async"), created once on first use.
+    """
+    database = _databases.get(kind)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(kind)
+            if database is None:
+                if not settings.DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL is not set, the database is not available.")
+                options = engine_options(settings.DATABASE_URL)
+                if kind == "sync":
+                    # Moteur synchrone : threads du solveur et des jobs (enregistrement des plannings)
+                    engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **options)
+                    database = (engine, sessionmaker(autocommit=False, autoflush=False, bind=engine))
+                else:
+                    # Moteur asynchrone : endpoints de lecture, sans bloquer de thread pendant les I/O
+                    engine = create_async_engine(async_database_url(), pool_pre_ping=True, **options)
+                    database = (engine, async_sessionmaker(engine, class_=AsyncSession, autoflush=False,
+                                                           expire_on_commit=False))
+                _databases[kind] = database
+    return database
+
+
+def get_engine():
+    return _database("sync")[0]
+
+
+def get_async_engine():
+    return _database("async")[0]
+
+
+def SessionLocal():
+    """
+    New sync session, as the former module-level sessionmaker.
+    """
+    return _database("sync")[1]()
+
+
+def AsyncSessionLocal():
+    """
+    New async session, as the former module-level async_sessionmaker.
+    """
+    return _database("async")[1]()
+
+
+async def dispose_engines():
+    """
+    Close the pools of the engines created so far.
+    """
+    for kind, (engine, _) in list(_databases.items()):
+        if kind == "async":
+            await engine.dispose()
+        else:
+            engine.dispose()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
     """
@@ -15,4 +110,27 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """
+    Dependency that provides an async database session, for async endpoints.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats():
+    """
+    Connection pool counters of the engines created so far, for the /metrics endpoint.
+    Pools without a counter (e.g. SQLite static pools) only report what they have.
+    """
+    stats = {}
+    for engine_name, (engine, _) in list(_databases.items()):
+        pool = engine.pool
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            counter = getattr(pool, name, None)
+            if callable(counter):
+                stats[(engine_name, name)] = counter()
+    return stats
@@ -0,0 +1,75 @@
+"""
+Formats de réponse des plannings, choisis d'après l'en-tête Accept.
+- application/json : noms des matières par jour (format par défaut)
+- application/x-msgpack : noms des matières une seule fois et planning en
+  buffer int32 little endian, tel que rendu par le solveur (si msgpack est installé)
+- application/octet-stream : une trame par planning,
+  [taille de l'en-tête, uint32 LE][en-tête JSON UTF-8][planning int32 LE]
+Dans les formats compacts, `schedule` contient des indices dans `subjects`
+(-1 pour un créneau vide) et `shape` ses dimensions.
+"""
+import json
+import struct
+
+import numpy as np
+from fastapi import Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/x-msgpack"
+RAW = "application/octet-stream"
+
+
+def negotiate(accept: str = None):
+    """
+    Best supported media type of an Accept header, JSON when nothing better matches.
+    """
+    offers = [JSON, RAW] + ([MSGPACK] if msgpack is not None else [])
+    best, best_quality = JSON, 0.0
+    for entry in (accept or "").split(","):
+        media_type, *options = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for option in options:
+            name, _, value = option.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in offers and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def compact(content: dict, schedule, shape):
+    """
+    Compact form of a planning: the other keys of content are kept as is.
+    """
+    schedule = np.ascontiguousarray(schedule, dtype="<i4")
+    return {**content, "shape": list(shape), "schedule": schedule.tobytes()}
+
+
+def encode(media_type: str, content: dict):
+    """
+    Encode one compact planning (see compact) as msgpack or as a raw frame.
+    Without `schedule` (e.g. an error), the raw frame has an empty payload.
+    """
+    if media_type == MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    payload = content.get("schedule", b"")
+    header = json.dumps({key: value for key, value in content.items() if key != "schedule"},
+                        ensure_ascii=False).encode("utf-8")
+    return struct.pack("<I", len(header)) + header + payload
+
+
+def planning_response(media_type: str, content: dict, schedule, shape, headers: dict = None):
+    """
+    Response carrying one compact planning.
+    """
+    return Response(content=encode(media_type, compact(content, schedule, shape)),
+                    media_type=media_type, headers=headers)
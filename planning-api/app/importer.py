@@ -0,0 +1,296 @@
+"""
+Import en masse des enseignants, classes et matières, en NDJSON ou en CSV.
+
+Le fichier est lu ligne par ligne et validé par lots avec un TypeAdapter.
+Chaque lot est écrit en une transaction, avec des insert/update groupés
+(executemany) : la mémoire reste bornée par la taille des lots, quelle que
+soit la taille du fichier.
+    python importer.py school.ndjson
+    python importer.py teachers.csv --type teacher
+Chaque ligne a un champ `type` (teacher, class ou subject), donné par --type
+pour un CSV sans colonne type. Un CSV a une ligne d'en-tête et un
+enregistrement par ligne ; une cellule vide est une valeur absente.
+Une ligne avec `id` met à jour cet enregistrement, sinon la clé naturelle
+est utilisée : email (ou prénom + nom) pour un enseignant,
+niveau/groupe/année/filière pour une classe, nom/semestre/classe pour une matière.
+"""
+import argparse
+import csv
+import json
+import sys
+from typing import List
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+from cache import teacher_cache
+from settings import settings
+
+NDJSON = "ndjson"
+CSV = "csv"
+# Erreurs détaillées dans le résumé, les suivantes sont seulement comptées
+MAX_ERRORS = 100
+
+# Ordre d'écriture : une matière peut désigner un enseignant ou une classe du même lot
+TABLES = {"teacher": models.Teacher, "class": models.Class, "subject": models.Subject}
+
+records_adapter = TypeAdapter(List[models.ImportRecord])
+
+
+def natural_keys(record_type: str, row: dict):
+    """
+    Keys identifying a row without its id. A teacher is found by email and by name.
+    """
+    if record_type == "teacher":
+        keys = [("name", row.get("first_name"), row.get("last_name"))]
+        if row.get("email"):
+            keys.insert(0, ("email", row["email"]))
+        return keys
+    if record_type == "class":
+        return [(row.get("level"), row.get("group"), row.get("year_id"), row.get("major_id"))]
+    return [(row.get("name"), row.get("semester"), row.get("class_id"))]
+
+
+class Importer:
+    """
+    Streaming upsert into the teachers, classes and subjects tables.
+    Feed it lines with add_line / add_lines, then call finish() for the summary.
+    """
+
+    def __init__(self, db: Session, batch_size: int = settings.IMPORT_BATCH_SIZE,
+                 file_format: str = NDJSON, record_type: str = None):
+        self.db = db
+        self.batch_size = max(batch_size, 1)
+        self.file_format = file_format
+        self.record_type = record_type
+        self.line_number = 0
+        self.inserted = dict.fromkeys(TABLES, 0)
+        self.updated = dict.fromkeys(TABLES, 0)
+        self.errors = []
+        self.error_count = 0
+        self._header = None
+        # Lignes brutes en attente de validation, puis enregistrements validés par table
+        self._pending = []
+        self._batches = {record_type: [] for record_type in TABLES}
+
+    def add_lines(self, lines):
+        for line in lines:
+            self.add_line(line)
+
+    def add_line(self, line: str):
+        self.line_number += 1
+        line = line.strip()
+        if not line:
+            return
+        if self.file_format == CSV:
+            values = next(csv.reader([line]))
+            if self._header is None:
+                self._header = [name.strip() for name in values]
+                return
+            raw = {name: value for name, value in zip(self._header, values) if value != ""}
+        else:
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                self._error(self.line_number, f"Invalid JSON: {e}")
+                return
+            if not isinstance(raw, dict):
+                self._error(self.line_number, "Each line must be a JSON object.")
+                return
+        if self.record_type:
+            raw.setdefault("type", self.record_type)
+        self._pending.append((self.line_number, raw))
+        if len(self._pending) >= self.batch_size:
+            self._validate()
+
+    def finish(self):
+        """
+        Write what is left and return the summary of the import.
+        """
+        self._validate()
+        self._flush()
+        return self.summary()
+
+    def summary(self):
+        return {
+            "lines": self.line_number,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+    def _error(self, line_number: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line_number, "error": message})
+
+    def _validate(self):
+        """
+        Validate the pending lines in one TypeAdapter call. The lines in error
+        are reported and the others validated again without them.
+        """
+        if not self._pending:
+            return
+        line_numbers = [line_number for line_number, _ in self._pending]
+        raws = [raw for _, raw in self._pending]
+        self._pending = []
+        try:
+            records = records_adapter.validate_python(raws)
+        except ValidationError as e:
+            failed = {}
+            for error in e.errors():
+                index, *field = error["loc"]
+                failed.setdefault(index, f"{'.'.join(map(str, field))}: {error['msg']}" if field else error["msg"])
+            for index, message in sorted(failed.items()):
+                self._error(line_numbers[index], message)
+            kept = [index for index in range(len(raws)) if index not in failed]
+            line_numbers = [line_numbers[index] for index in kept]
+            records = records_adapter.validate_python([raws[index] for index in kept]) if kept else []
+
+        for line_number, record in zip(line_numbers, records):
+            self._batches[record.type].append((line_number, record))
+        if any(len(batch) >= self.batch_size for batch in self._batches.values()):
+            self._flush()
+
+    def _flush(self):
+        """
+        Write every validated batch in one transaction.
+        """
+        if not any(self._batches.values()):
+            return
+        try:
+            for record_type, batch in self._batches.items():
+                if batch:
+                    self._write(record_type, batch)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            self._batches = {record_type: [] for record_type in TABLES}
+        # Les pages de /teachers contiennent les matières
+        teacher_cache.bump()
+
+    def _write(self, record_type: str, batch: list):
+        model = TABLES[record_type]
+        rows = {}
+        for line_number, record in batch:
+            # Seuls les champs présents sont écrits, une mise à jour ne vide pas les autres
+            row = record.model_dump(exclude={"type", "teacher_email"}, exclude_unset=True)
+            if record_type == "subject" and record.teacher_email and record.teacher_id is None:
+                row["teacher_email"] = record.teacher_email
+            row["line"] = line_number
+            # Une même clé plusieurs fois dans le lot : la dernière ligne l'emporte
+            key = ("id", row["id"]) if row.get("id") is not None else natural_keys(record_type, row)[0]
+            rows[key] = {**rows.get(key, {}), **row}
+        rows = list(rows.values())
+        if record_type == "subject":
+            rows = self._resolve_teachers(rows)
+
+        existing = self._existing(record_type, rows)
+        inserts, updates = [], []
+        for row in rows:
+            del row["line"]
+            row_id = row.get("id")
+            if row_id is None:
+                row_id = next((existing[key] for key in natural_keys(record_type, row) if key in existing), None)
+            if row_id is not None and ("id", row_id) in existing:
+                updates.append({**row, "id": row_id})
+            else:
+                inserts.append(row)
+        if inserts:
+            self.db.execute(insert(model), inserts)
+        if updates:
+            self.db.execute(update(model), updates)
+        self.inserted[record_type] += len(inserts)
+        self.updated[record_type] += len(updates)
+
+    def _existing(self, record_type: str, rows: list):
+        """
+        Ids already in the table for the rows of a batch, by ("id", id) and by natural key.
+        One query per kind of key, filtered on an indexed column then matched here.
+        """
+        model = TABLES[record_type]
+        existing = {}
+        ids = [row["id"] for row in rows if row.get("id") is not None]
+        if ids:
+            existing.update((("id", row_id), row_id) for row_id in self.db.scalars(select(model.id).where(model.id.in_(ids))))
+
+        keyless = [row for row in rows if row.get("id") is None]
+        if not keyless:
+            return existing
+        if record_type == "teacher":
+            emails = list({row["email"] for row in keyless if row.get("email")})
+            names = list({row["last_name"] for row in keyless})
+            found = self.db.execute(
+                select(model.id, model.first_name, model.last_name, model.email)
+                .where(model.email.in_(emails) | model.last_name.in_(names)))
+        elif record_type == "class":
+            found = self.db.execute(
+                select(model.id, model.level, model.group, model.year_id, model.major_id)
+                .where(model.level.in_(list({row["level"] for row in keyless}))))
+        else:
+            found = self.db.execute(
+                select(model.id, model.name, model.semester, model.class_id)
+                .where(model.name.in_(list({row["name"] for row in keyless}))))
+        for row in found.mappings():
+            existing[("id", row["id"])] = row["id"]
+            for key in natural_keys(record_type, row):
+                existing.setdefault(key, row["id"])
+        return existing
+
+    def _resolve_teachers(self, rows: list):
+        """
+        teacher_email to teacher_id, in one query. Rows with an unknown email are reported and dropped.
+        """
+        emails = list({row["teacher_email"] for row in rows if "teacher_email" in row})
+        if not emails:
+            return rows
+        teacher_ids = dict(self.db.execute(
+            select(models.Teacher.email, models.Teacher.id).where(models.Teacher.email.in_(emails))).all())
+        resolved = []
+        for row in rows:
+            email = row.pop("teacher_email", None)
+            if email is not None:
+                if email not in teacher_ids:
+                    self._error(row["line"], f"teacher_email: unknown teacher {email}")
+                    continue
+                row["teacher_id"] = teacher_ids[email]
+            resolved.append(row)
+        return resolved
+
+
+def detect_format(path: str = None, content_type: str = None):
+    """
+    CSV for a .csv file or a text/csv body, NDJSON otherwise.
+    """
+    if (path or "").lower().endswith(".csv") or "csv" in (content_type or "").lower():
+        return CSV
+    return NDJSON
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import teachers, classes and subjects into the database.")
+    parser.add_argument("path", help="NDJSON or CSV file, - for stdin")
+    parser.add_argument("--format", choices=(NDJSON, CSV), help="default: from the file extension")
+    parser.add_argument("--type", choices=tuple(TABLES), help="type of the lines without a type field")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from db.session import SessionLocal
+
+    args = parse_args()
+    file = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8", newline="")
+    with file, SessionLocal() as db:
+        importer = Importer(db, batch_size=args.batch_size, file_format=args.format or detect_format(args.path),
+                            record_type=args.type)
+        importer.add_lines(file)
+        summary = importer.finish()
+    print(json.dumps(summary, indent=2))
+    if summary["error_count"]:
+        sys.exit(1)
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+import uuid
+
+from settings import settings
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, func, args):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue for long running solves.
+    A bounded queue gives backpressure: submit raises QueueFull once
+    `max_queue` jobs are waiting. Finished jobs are kept `result_ttl` seconds.
+    """
+
+    def __init__(self, workers: int, max_queue: int, result_ttl: float):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args):
+        self.start()
+        job = Job(func, args)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        """
+        Cancel a job. A queued job is never run; a running native solve cannot be
+        interrupted, its result is dropped when it returns.
+        Returns the job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in (QUEUED, RUNNING):
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            return job
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"workers": self.workers, "max_queue": self._queue.maxsize, "jobs": counts}
+
+    def _purge(self):
+        limit = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status == CANCELLED:
+                    job.args = ()
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+            try:
+                result, error, status = job.func(*job.args), None, DONE
+            except Exception as e:
+                result, error, status = None, str(e), FAILED
+            with self._lock:
+                if job.status == RUNNING:
+                    job.result, job.error, job.status = result, error, status
+                    job.finished_at = time.time()
+                # The job arguments are no longer needed
+                job.args = ()
+
+
+job_queue = JobQueue(
+    workers=settings.JOBS_WORKERS,
+    max_queue=settings.JOBS_MAX_QUEUE,
+    result_ttl=settings.JOBS_RESULT_TTL_SECONDS,
+)
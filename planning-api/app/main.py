@@ -1,19 +1,100 @@
-from typing import Union, List
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Union, List, Optional
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from rustml_wrapper import Rustml
+from rustml_wrapper import Rustml, NativeError, STATUS_INVALID_INPUT
+from cache import planning_cache, planning_flights, teacher_cache
+from jobs import job_queue, QueueFull
+from metrics import (REQUEST_DURATION, PLANNING_STAGE_DURATION, SamplingProfiler,
+                     bind_profiler, profiled, profiles, render_gauges, request_profiler)
+from settings import settings
 from db.session import *
 import basic_function as fn
+import formats
+import importer
 import models as models
+import scoring
+import solver
 
 
-app = FastAPI()
-rustml = Rustml()
+logger = logging.getLogger(__name__)
 
-data = fn.load_data()
+
+# La librairie Rust et le catalogue sont chargés au premier usage ou par le
+# warm-up lancé au démarrage, l'import de ce module reste rapide
+rustml = Rustml(max_concurrency=settings.NATIVE_MAX_CONCURRENCY)
+
+# État du warm-up, exposé par /ready
+warmup = {"ready": False, "error": None, "elapsed_ms": None}
+
+
+def run_warmup():
+    """
+    Load the native library and the catalog, then solve a tiny class with each
+    solver, so the first real request does not pay for it.
+    """
+    start = time.perf_counter()
+    try:
+        fn.get_catalog()
+        solver.warm_up(rustml)
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        warmup["error"] = str(e)
+    else:
+        warmup["ready"] = True
+    warmup["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Table des plannings générés, les autres tables sont gérées ailleurs
+    if settings.DATABASE_URL:
+        try:
+            models.Base.metadata.create_all(bind=get_engine(), tables=[models.Planning.__table__])
+        except Exception:
+            logger.exception("Could not create the plannings table")
+    else:
+        logger.warning("DATABASE_URL is not set, the database endpoints are disabled")
+    # En tâche de fond : le serveur accepte les requêtes pendant le warm-up
+    if settings.WARMUP_ENABLED:
+        asyncio.get_running_loop().run_in_executor(solver.executor, run_warmup)
+    else:
+        warmup["ready"] = True
+    yield
+    await dispose_engines()
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route whose endpoint thread is sampled when its request is profiled.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = ProfiledRoute
+
+@app.exception_handler(NativeError)
+async def native_error_handler(request: Request, exc: NativeError):
+    """
+    A failed solver call: 400 when the Rust side refused the input, 500 otherwise.
+    """
+    logger.error("Native call failed: %s", exc)
+    return JSONResponse(status_code=400 if exc.status == STATUS_INVALID_INPUT else 500, content={"error": str(exc)})
 
 # Add CORS middleware
 app.add_middleware(
@@ -24,25 +105,174 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Time every request for /metrics. With PROFILING_ENABLED, a request sent
+    with `X-Profile: 1` is also sampled, its endpoint and solver threads only,
+    until the response headers are sent. Its profile is served at
+    /metrics/profiles/{X-Profile-Id}.
+    """
+    request.state.start = time.perf_counter()
+    profiler = None
+    if settings.PROFILING_ENABLED and request.headers.get("x-profile") == "1":
+        profiler = SamplingProfiler(settings.PROFILING_INTERVAL_MS / 1000).start()
+        profiler_token = request_profiler.set(profiler)
+
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        REQUEST_DURATION.observe(
+            time.perf_counter() - request.state.start,
+            endpoint=route.path if route is not None else "unmatched",
+            method=request.method,
+            status=status,
+            algorithm=getattr(request.state, "algorithm", ""),
+        )
+        if profiler is not None:
+            request_profiler.reset(profiler_token)
+            profile_id = uuid.uuid4().hex
+            profiles.add(profile_id, profiler.stop())
+    if profiler is not None:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Endpoint to get the latency histograms, cache, job queue and database pool
+    counters in the Prometheus text format.
+    """
+    cache_stats = planning_cache.stats()
+    jobs_stats = job_queue.stats()
+    blocks = [
+        REQUEST_DURATION.render(),
+        PLANNING_STAGE_DURATION.render(),
+        render_gauges("planning_cache", "Planning cache counters.",
+                      {(("counter", name),): cache_stats[name] for name in ("size", "hits", "misses")}),
+        render_gauges("teacher_cache", "Teacher cache counters.",
+                      {(("counter", name),): value for name, value in teacher_cache.stats().items() if name not in ("max_size", "ttl")}),
+        render_gauges("planning_coalescing", "Coalesced planning solves.",
+                      {(("counter", name),): value for name, value in planning_flights.stats().items()}),
+        render_gauges("planning_jobs", "Planning jobs by status.",
+                      {(("status", status),): count for status, count in jobs_stats["jobs"].items()}),
+        render_gauges("db_pool_connections", "Database connection pool counters.",
+                      {(("engine", engine_name), ("state", name)): value
+                       for (engine_name, name), value in pool_stats().items()}),
+    ]
+    return PlainTextResponse("\n".join(blocks) + "\n", media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Endpoint to get a request profile, in collapsed stack format.
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found."})
+    return PlainTextResponse(profile)
+
 @app.get("/")
 def read_root():
     return {"Hello": "Hello World"}
 
+@app.get("/ready")
+def read_ready():
+    """
+    Endpoint to check if the worker is ready: 200 once the warm-up is done, 503 before
+    (or if it failed, with its error).
+    """
+    if not warmup["ready"]:
+        return JSONResponse(status_code=503, content=warmup)
+    return warmup
+
+def generate_and_store(planning_data: models.PlanningData, bypass: bool = False):
+    """
+    Solve a class through the planning cache and, when params.week_number is set,
+    store the planning for /get_planning.
+    Returns the solver result (planning, elapsed_ms, ...) and the cache status.
+    """
+    key = fn.hash_planning_data(planning_data)
+    result, cache_status = solver.solve_planning_cached(rustml, planning_data, bypass=bypass, key=key)
+    # Aussi pour une requête fusionnée : la clé ignore la classe et la semaine,
+    # save_planning ne crée pas de doublon pour les mêmes entrées
+    if planning_data.params.week_number is not None:
+        with SessionLocal() as db:
+            fn.save_planning(db, planning_data, key, solver.planning_to_json(result, planning_data.params)["planning"])
+    return result, cache_status
+
+def is_cache_bypassed(cache_control: Optional[str]):
+    """
+    True when the Cache-Control header asks for a fresh planning.
+    """
+    return cache_control is not None and "no-cache" in cache_control.lower()
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """
+    Endpoint to get the planning and teacher cache counters, and the
+    coalesced /generate_planning solves.
+    """
+    return {**planning_cache.stats(), "teachers": teacher_cache.stats(), "coalescing": planning_flights.stats()}
+
 @app.get("/teachers")
-def get_teachers(db: Session = Depends(get_db)):
-    datas = fn.get_teachers(db)
+async def get_teachers(after_id: Optional[int] = None, limit: int = Query(100, ge=1, le=1000),
+                       include_subjects: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Endpoint to get the teachers, one page at a time.
+    - after_id: next_after_id of the previous page, none for the first page
+    - limit: page size
+    - include_subjects: add the subjects of each teacher
+    Pages are cached until an import of this worker, or for TEACHER_CACHE_TTL_SECONDS
+    (writes from other workers or clients).
+    """
+    key = (after_id, limit, include_subjects)
+    teachers = teacher_cache.get(key)
+    if teachers is None:
+        version = teacher_cache.version
+        teachers = await fn.get_teachers(db, after_id=after_id, limit=limit, include_subjects=include_subjects)
+        teacher_cache.set(key, teachers, version)
     return {
-        "teachers": [
-            {
-                "first_name": teacher.first_name,
-                "last_name": teacher.last_name,
-                "email": teacher.email
-            }
-            for teacher in datas
-        ],
-        "data": datas
+        "teachers": teachers,
+        "next_after_id": teachers[-1]["id"] if len(teachers) == limit else None,
     }
 
+@app.post("/import")
+async def import_data(request: Request, format: Optional[str] = None, type: Optional[str] = None,
+                      batch_size: int = Query(settings.IMPORT_BATCH_SIZE, ge=1, le=100000)):
+    """
+    Endpoint to import teachers, classes and subjects in bulk, streamed from the body.
+    - format: ndjson or csv, from the Content-Type when missing
+    - type: teacher, class or subject, for the lines without a type field
+    - batch_size: lines validated and written per transaction
+    Each line is upserted by id, or by natural key (see importer.py).
+    Returns the inserted / updated counts per table and the lines in error.
+    """
+    file_format = format or importer.detect_format(content_type=request.headers.get("content-type"))
+    if file_format not in (importer.NDJSON, importer.CSV):
+        return JSONResponse(status_code=400, content={"error": "Invalid format. Use 'ndjson' or 'csv'."})
+    if type is not None and type not in importer.TABLES:
+        return JSONResponse(status_code=400, content={"error": "Invalid type. Use 'teacher', 'class' or 'subject'."})
+
+    with SessionLocal() as db:
+        bulk = importer.Importer(db, batch_size=batch_size, file_format=file_format, record_type=type)
+        # Le corps est lu morceau par morceau : seules les lignes complètes partent à l'import,
+        # les écritures en base tournent hors de la boucle d'événements
+        rest = b""
+        try:
+            async for chunk in request.stream():
+                *lines, rest = (rest + chunk).split(b"\n")
+                if lines:
+                    await run_in_threadpool(bulk.add_lines, [line.decode("utf-8") for line in lines])
+            await run_in_threadpool(bulk.add_lines, [rest.decode("utf-8")])
+            return await run_in_threadpool(bulk.finish)
+        except Exception as e:
+            logger.exception("Import failed")
+            return JSONResponse(status_code=500, content={"error": str(e), **bulk.summary()})
+
 @app.get("/info")
 def read_info(category: str = None, name: str = None):
     """
@@ -50,14 +280,15 @@ def read_info(category: str = None, name: str = None):
     - category: Filter by category (e.g., 'teacher', 'class', 'subject').
     - name: Filter by specific name (e.g., teacher's name or subject name).
     """
+    data = fn.get_catalog()
     if category == "teacher":
-        return {"teachers": [subject for subject in data["subjects"] if subject["teacher"] == name]} if name else {"teachers": [subject["teacher"] + " - " + subject["name"] for subject in data["subjects"]]}
+        return {"teachers": data.subjects_by_teacher(name)} if name else {"teachers": data.teacher_labels()}
     elif category == "class":
-        return {"class": data["params"]}
+        return {"class": data.params()}
     elif category == "subject":
-        return {"subjects": [subject for subject in data["subjects"] if subject["name"] == name]} if name else {"subjects": data["subjects"]}
+        return {"subjects": data.subjects_by_name(name)} if name else {"subjects": data.subjects()}
     elif category == "rooms":
-        return {"rooms": [room for room in data["rooms"] if room["name"] == name]} if name else {"rooms": data["rooms"]}
+        return {"rooms": data.rooms_by_name(name)} if name else {"rooms": data.rooms()}
     else:
         return {"error": "Invalid category. Use 'teacher', 'class', 'subject', or 'rooms'."}
     
@@ -73,9 +304,7 @@ def edit_info(category: str = None, operation: str = None, name: str = None):
     if category == "subjects":
         if operation == "hours":
             if name:
-                for subject in data["subjects"]:
-                    if subject["name"] == name:
-                        subject["hours_todo"] -= 1.5
+                fn.get_catalog().remove_hours_todo(name, 1.5)
             else:
                 return {"error": "Name is required for 'hours' operation."}
 
@@ -88,87 +317,281 @@ def add_unvailable(name: str = None, slots: List[int] = []):
     - slots: A list of time slots to mark as unavailable.
     """
     if name:
-        for subject in data["subjects"]:
-            if subject["name"] == name or subject["teacher"] == name:
-                subject["unavailable_periods"].extend(slots)
+        fn.get_catalog().add_unavailable(name, slots)
     else:
         return {"error": "Name is required for 'unvailable' operation."}
 
 
 @app.post("/generate_planning")
-def generate_planning(planning_data: models.PlanningData):
+def generate_planning(planning_data: models.PlanningData, request: Request, response: Response,
+                      cache_control: Optional[str] = Header(None), accept: Optional[str] = Header(None)):
     """
     Endpoint to generate a greedy planning.
     - planning_data: JSON object containing :
-    - - params = class_name, slots_per_day, days_per_week, max_hours_per_week
+    - - params = class_name, slots_per_day, days_per_week, max_hours_per_week, algorithm
     - - List of subjects = name, teacher, hours_todo, hours_total, unavailable_periods
     - - List of rooms  = name, capacity
+    algorithm is greedy, greedy_mc, min_conflicts or portfolio. min_conflicts stops
+    after params.max_iterations or params.time_budget_ms and returns the best
+    planning found with its conflict count. portfolio runs the three solvers
+    concurrently and returns the best scored planning with every solver's
+    score and time (params.portfolio_deadline_ms to cap the wait).
+    The response also gives the solver time in elapsed_ms.
+    Identical inputs are served from the planning cache, send
+    `Cache-Control: no-cache` to force a new solve.
+    With `Accept: application/x-msgpack` or `application/octet-stream` the
+    planning is sent as a subject list plus an int32 buffer (see formats).
     """
-    # Prepare data for Rust function
-    subject_dict = {index: subject for index, subject in enumerate(planning_data.subjects)}
-    subject_dict[-1] = models.InputSubject.create_empty(models.InputSubject)
+    # Body read, JSON decoding and PlanningData validation happen before the handler
+    algorithm = planning_data.params.algorithm
+    PLANNING_STAGE_DURATION.observe(time.perf_counter() - request.state.start, stage="validation", algorithm=algorithm)
+    request.state.algorithm = algorithm
 
-    total_slots = planning_data.params.slots_per_day * planning_data.params.days_per_week
-    max_hours = planning_data.params.max_hours_per_week
-    slot_minutes = 90
-    subjects = list(subject_dict.keys())
-    todo = [subject_dict[i].hours_todo for i in subjects]
-    dones = [subject_dict[i].hours_done for i in subjects]
-    total = [subject_dict[i].hours_total for i in subjects]
-    unavailability = [subject_dict[i].unavailable_periods for i in subjects]
-
-    # Generate planning using Rust function
-    if planning_data.params.algorithm == "greedy":
-        resultat = rustml.generate_greedy_planning(
-            total_slots=total_slots,
-            max_hours=max_hours,
-            slot_minutes=slot_minutes,
-            subjects=subjects,
-            todo=todo,
-            unavailability=unavailability
-        )
-    elif planning_data.params.algorithm == "greedy_mc":
-        resultat = rustml.generate_greedy_mc_planning(
-            total_slots=total_slots,
-            max_weekly_hours=max_hours,
-            slot_minutes=slot_minutes,
-            subjects=subjects, unavailability=unavailability,
-            hours_done=dones, all_hours=total
-        )
-    else:
-        # Greedy MC algorithm as default
-        resultat = rustml.generate_greedy_mc_planning(
-            total_slots=total_slots,
-            max_weekly_hours=max_hours,
-            slot_minutes=slot_minutes,
-            subjects=subjects, unavailability=unavailability,
-            hours_done=dones, all_hours=total
-        )
+    result, cache_status = generate_and_store(planning_data, bypass=is_cache_bypassed(cache_control))
+    media_type = formats.negotiate(accept)
+    if media_type != formats.JSON:
+        content = {key: value for key, value in result.items() if key != "schedule"}
+        shape = (planning_data.params.days_per_week, planning_data.params.slots_per_day)
+        return formats.planning_response(media_type, content, result["schedule"], shape,
+                                         headers={"X-Cache": cache_status})
+    response.headers["X-Cache"] = cache_status
+    return {
+        "message": "Planning generated successfully",
+        **solver.planning_to_json(result, planning_data.params),
+    }
+
+@app.post("/generate_planning/batch")
+async def generate_planning_batch(batch: List[models.PlanningData], accept: Optional[str] = Header(None)):
+    """
+    Endpoint to generate the plannings of many classes at once.
+    - batch: list of planning_data objects (see /generate_planning)
+    The classes are solved in parallel on the solver pool and each result is
+    streamed back as a NDJSON line as soon as it is ready:
+    - - index = position of the class in the batch
+    - - class_name = params.class_name of the class
+    - - planning, elapsed_ms... as in /generate_planning, or error
+    With `Accept: application/x-msgpack` the stream is a sequence of msgpack
+    objects, with `application/octet-stream` a sequence of raw frames, each
+    class in the compact form of /generate_planning.
+    """
+    loop = asyncio.get_running_loop()
+    media_type = formats.negotiate(accept)
+
+    def encode(line: dict, planning_data: models.PlanningData, result: dict = None):
+        if media_type == formats.JSON:
+            if result is not None:
+                line.update(solver.planning_to_json(result, planning_data.params))
+            return json.dumps(line) + "\n"
+        if result is None:
+            return formats.encode(media_type, line)
+        line.update({key: value for key, value in result.items() if key != "schedule"})
+        shape = (planning_data.params.days_per_week, planning_data.params.slots_per_day)
+        return formats.encode(media_type, formats.compact(line, result["schedule"], shape))
+
+    async def solve(index: int, planning_data: models.PlanningData):
+        try:
+            result, _ = await loop.run_in_executor(
+                solver.executor, bind_profiler(generate_and_store), planning_data
+            )
+            return encode({"index": index, "class_name": planning_data.params.class_name}, planning_data, result)
+        except Exception as e:
+            return encode({"index": index, "class_name": planning_data.params.class_name, "error": str(e)}, planning_data)
+
+    tasks = [asyncio.ensure_future(solve(index, planning_data)) for index, planning_data in enumerate(batch)]
 
-    # Pretify the result
-    resultat = [subject_dict[i].name for i in resultat]
-    resultat = [resultat[i:i + planning_data.params.slots_per_day] for i in range(0, len(resultat), planning_data.params.slots_per_day)]
+    async def stream():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client gone: drop the classes that have not started yet
+            for task in tasks:
+                task.cancel()
 
+    return StreamingResponse(stream(), media_type=formats.NDJSON if media_type == formats.JSON else media_type)
+
+@app.post("/generate_planning/multi")
+def generate_planning_multi(multi: models.MultiPlanningData, request: Request):
+    """
+    Endpoint to generate the plannings of several classes at once, teachers
+    and rooms being shared by all of them.
+    - multi: JSON object containing :
+    - - classes = list of the same objects as /generate_planning, on the same slot grid
+    - - rooms = rooms shared by every class, added to the rooms of each class
+    A room is only given to a class whose params.class_size it can hold.
+    """
+    if not multi.classes:
+        return JSONResponse(status_code=400, content={"error": "No class to plan."})
+    grids = {(planning_data.params.slots_per_day, planning_data.params.days_per_week) for planning_data in multi.classes}
+    if len(grids) > 1:
+        return JSONResponse(status_code=400, content={"error": "All the classes must have the same slots_per_day and days_per_week."})
+
+    request.state.algorithm = "multi_class"
+    result = solver.solve_multi_class(rustml, multi)
     return {
-        "message": "Planning generated successfully",
-        "planning": resultat,
+        "message": "Plannings generated successfully",
+        **result,
     }
 
-@app.get("/get_planning/{week_number}/{class_name}")
-def get_planning(week_number: int, class_name: str):
+@app.post("/generate_planning/horizon")
+def generate_planning_horizon(planning_data: models.PlanningData, request: Request,
+                              weeks: int = Query(..., ge=1, le=52), accept: Optional[str] = Header(None)):
     """
-    Endpoint to get the current planning.
+    Endpoint to generate the plannings of the next weeks of a class in one call,
+    with greedy_mc, the hours done each week counting for the next ones.
+    - planning_data: same object as /generate_planning, hours_done as of the first week
+    - weeks: number of weeks to plan
+    `planning` is a week x slot matrix of indexes into `subjects`, -1 for an
+    empty slot. When params.week_number is set, each week is stored for
+    /get_planning from that week on.
+    Accepts the compact formats of /generate_planning, shaped (weeks, days, slots).
     """
-    # Here you would typically retrieve the planning from a database or a file.
-    # For this example, we will return a static response.
+    request.state.algorithm = "horizon"
+    result = solver.solve_horizon(rustml, planning_data, weeks)
+    resultat = result.pop("schedule")
+    if planning_data.params.week_number is not None:
+        stored = planning_data.model_copy(update={"params": planning_data.params.model_copy(update={"algorithm": "greedy_mc"})})
+        key = fn.hash_planning_data(stored)
+        subject_dict = solver.build_subject_dict(planning_data)
+        with SessionLocal() as db:
+            for week, schedule in enumerate(resultat):
+                week_data = stored.model_copy(update={"params": stored.params.model_copy(
+                    update={"week_number": planning_data.params.week_number + week})})
+                fn.save_planning(db, week_data, key,
+                                 solver.prettify_planning(schedule, subject_dict, planning_data.params.slots_per_day))
+    media_type = formats.negotiate(accept)
+    if media_type != formats.JSON:
+        shape = (weeks, planning_data.params.days_per_week, planning_data.params.slots_per_day)
+        return formats.planning_response(media_type, {"weeks": weeks, **result}, resultat, shape)
     return {
-        "message": f"Planning for week {week_number} and class {class_name} retrieved successfully",
-        "planning": [
-            ['Mathématiques', 'Physique', 'empty', 'Mathématiques', 'Chimie', 'empty'],
-            ['Physique', 'Mathématiques', 'Chimie', 'empty', 'Physique', 'Mathématiques'],
-            ['Chimie', 'empty', 'Mathématiques', 'Physique', 'empty', 'Chimie'],
-            ['empty', 'Chimie', 'Physique', 'empty', 'Mathématiques', 'Physique'],
-            ['Mathématiques', 'empty', 'empty', 'Chimie', 'Physique', 'empty'],
-            ['empty', 'Physique', 'Mathématiques', 'empty', 'empty', 'Chimie']
-        ]
+        "message": "Plannings generated successfully",
+        "weeks": weeks,
+        "planning": resultat.tolist(),
+        **result,
     }
+
+@app.post("/replan")
+def replan(replan_data: models.ReplanData):
+    """
+    Endpoint to update an existing planning after a change instead of
+    generating a new one.
+    - replan_data: JSON object containing :
+    - - planning_data = same object as /generate_planning
+    - - planning = the current planning, as returned by /generate_planning
+    - - changes = list of name (subject or teacher), unavailable_periods, hours_todo
+    Only the affected slots move, the response lists them in `changes`.
+    """
+    planning_data = solver.apply_changes(replan_data.planning_data, replan_data.changes)
+    planning, diff = solver.repair_planning(rustml, planning_data, replan_data.planning)
+    if planning_data.params.week_number is not None:
+        with SessionLocal() as db:
+            fn.save_planning(db, planning_data, fn.hash_planning_data(planning_data), planning)
+    return {
+        "message": "Planning updated successfully",
+        "planning": planning,
+        "changes": diff,
+    }
+
+@app.post("/evaluate")
+def evaluate(evaluation_data: models.EvaluationData):
+    """
+    Endpoint to evaluate the quality of one or many plannings of a class.
+    - evaluation_data: JSON object containing :
+    - - planning_data = same object as /generate_planning
+    - - plannings = plannings as returned by /generate_planning, and/or
+    - - schedules = one subject index per slot (-1 for empty), as the compact formats
+    Each evaluation gives the score (lower is better), unavailability violations,
+    hours scheduled vs hours_todo, hours per day and their imbalance, gaps and
+    max_hours_per_week overflow. `best` is the index of the lowest score.
+    """
+    planning_data = evaluation_data.planning_data
+    total_slots = planning_data.params.slots_per_day * planning_data.params.days_per_week
+    if not evaluation_data.plannings and not evaluation_data.schedules:
+        return JSONResponse(status_code=400, content={"error": "No planning to evaluate."})
+    if any(len(schedule) != total_slots for schedule in evaluation_data.schedules):
+        return JSONResponse(status_code=400, content={"error": f"Each schedule must have {total_slots} slots."})
+
+    schedules = scoring.stack_schedules(evaluation_data.plannings, evaluation_data.schedules, planning_data)
+    evaluation = {name: values.tolist()
+                  for name, values in scoring.evaluate_plannings(schedules, planning_data, solver.SLOT_MINUTES / 60).items()}
+    return {
+        "count": len(schedules),
+        "subjects": [subject.name for subject in planning_data.subjects],
+        "best": min(range(len(schedules)), key=evaluation["score"].__getitem__),
+        "evaluations": [dict(zip(evaluation, values)) for values in zip(*evaluation.values())],
+    }
+
+def solve_planning_job(planning_data: models.PlanningData):
+    result, _ = generate_and_store(planning_data)
+    return solver.planning_to_json(result, planning_data.params)
+
+@app.post("/jobs/planning", status_code=202)
+def submit_planning_job(planning_data: models.PlanningData):
+    """
+    Endpoint to generate a planning in the background.
+    - planning_data: same body as /generate_planning
+    Returns a job_id to poll with GET /jobs/{job_id}.
+    """
+    try:
+        job = job_queue.submit(solve_planning_job, planning_data)
+    except QueueFull as e:
+        return JSONResponse(status_code=503, content={"error": str(e)}, headers={"Retry-After": "5"})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/stats")
+def get_jobs_stats():
+    """
+    Endpoint to get the job queue configuration and job counts by status.
+    """
+    return job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Endpoint to get the status of a job, and its result once done.
+    - status: queued, running, done, failed or cancelled
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Endpoint to cancel a queued or running job.
+    """
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/get_planning/{week_number}/{class_name}")
+async def get_planning(week_number: int, class_name: str, algorithm: str = None,
+                       if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    """
+    Endpoint to get the last planning generated for a class and week.
+    - algorithm: only look at plannings generated with this algorithm.
+    The response carries an ETag, send it back in If-None-Match to get a
+    304 when the planning has not changed.
+    """
+    version = await fn.get_planning_version(db, class_name, week_number, algorithm)
+    if version is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"No planning stored for week {week_number} and class {class_name}."}
+        )
+
+    etag = f'"{version.id}-{version.input_hash[:16]}"'
+    if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    stored = await fn.get_planning(db, version.id)
+    return JSONResponse(
+        content={
+            "message": f"Planning for week {week_number} and class {class_name} retrieved successfully",
+            "algorithm": stored.algorithm,
+            "planning": stored.planning,
+        },
+        headers={"ETag": etag},
+    )
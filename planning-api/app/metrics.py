@@ -0,0 +1,217 @@
+"""
+Métriques au format texte Prometheus et profileur par échantillonnage.
+"""
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# Bornes des histogrammes, en secondes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels.keys(), escaped)) + "}"
+
+
+class Histogram:
+    """
+    Latency histogram with one series per label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return "\n".join(lines)
+
+
+def render_gauges(name: str, documentation: str, values: dict):
+    """
+    Render a gauge family, values maps a label dict (as a tuple of items) to a number.
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labels, value in values.items():
+        lines.append(f"{name}{_format_labels(dict(labels))} {value}")
+    return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response headers are sent.",
+    ("endpoint", "method", "status", "algorithm"),
+)
+
+PLANNING_STAGE_DURATION = Histogram(
+    "planning_stage_duration_seconds",
+    "Time spent in each stage of a planning generation.",
+    ("stage", "algorithm"),
+)
+
+
+class SamplingProfiler:
+    """
+    Samples, every `interval` seconds, the Python stacks of the threads working
+    for one request (see thread and profiled), when they run code of this app.
+    Async endpoints run on the event loop thread, the coroutines of other
+    requests running at the same time are sampled with them.
+    The result is in collapsed stack format ("frame;frame;frame count" per
+    line), readable by flamegraph tools.
+    """
+
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        # Threads sampled, with their number of nested thread() blocks
+        self._threads = Counter()
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    @contextmanager
+    def thread(self):
+        """
+        Sample the current thread until the block exits.
+        """
+        thread_id = threading.get_ident()
+        with self._threads_lock:
+            self._threads[thread_id] += 1
+        try:
+            yield
+        finally:
+            with self._threads_lock:
+                self._threads[thread_id] -= 1
+                if not self._threads[thread_id]:
+                    del self._threads[thread_id]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                thread_ids = set(self._threads)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in thread_ids:
+                    continue
+                stack, in_app = [], False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(self.APP_DIR)
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                if in_app:
+                    self.samples[";".join(reversed(stack))] += 1
+
+
+# Profileur de la requête en cours, positionné par le middleware
+request_profiler = ContextVar("request_profiler", default=None)
+
+
+def profiled(func):
+    """
+    Wrap func so the thread running it is sampled by the profiler of the
+    current request, if any.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            profiler = request_profiler.get()
+            if profiler is None:
+                return await func(*args, **kwargs)
+            with profiler.thread():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = request_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        with profiler.thread():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def bind_profiler(func):
+    """
+    func as given to an executor: the executor threads do not inherit the
+    request context, the request profiler is carried over when one is running.
+    """
+    if request_profiler.get() is None:
+        return func
+    return functools.partial(copy_context().run, profiled(func))
+
+
+class ProfileStore:
+    """
+    Keeps the last `max_size` request profiles.
+    """
+
+    def __init__(self, max_size: int = 20):
+        self.max_size = max_size
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, profile: str):
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+profiles = ProfileStore()
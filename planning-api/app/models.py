@@ -1,7 +1,7 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
 from sqlalchemy import (Column, Integer, String, DateTime, func, Boolean, Enum,
-                        Float, Date, Time, ForeignKey)
+                        Float, Date, Time, ForeignKey, JSON, Index)
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 import enum
@@ -32,16 +32,84 @@ class Room(BaseModel):
 
 class Params(BaseModel):
     class_name: str
-    slots_per_day: int
-    days_per_week: int
-    max_hours_per_week: int
-    algorithm: str = "greedy"
+    # Grille de la semaine : refusée (422) si vide ou négative, avant le solveur
+    slots_per_day: int = Field(gt=0)
+    days_per_week: int = Field(gt=0)
+    max_hours_per_week: int = Field(ge=0)
+    algorithm: Literal["greedy", "greedy_mc", "min_conflicts", "portfolio"] = "greedy"
+    # Budget de l'algorithme min_conflicts, borné : passé au solveur en int32
+    max_iterations: int = Field(1000, ge=1, le=100_000)
+    time_budget_ms: Optional[int] = Field(None, ge=0, le=60_000)
+    # Mode portfolio : délai après lequel le meilleur résultat déjà obtenu est retenu
+    portfolio_deadline_ms: Optional[int] = Field(None, ge=0, le=60_000)
+    # Si renseigné, le planning généré est enregistré pour /get_planning
+    week_number: Optional[int] = None
+    # Effectif de la classe, les salles plus petites sont ignorées (mode multi-classes)
+    class_size: int = 0
 
 class PlanningData(BaseModel):
     params: Params
     subjects: List[InputSubject]
     rooms: List[Room]
 
+class PlanningChange(BaseModel):
+    # Nom de la matière ou de l'enseignant concerné
+    name: str
+    unavailable_periods: List[int] = []
+    # Nouveau volume d'heures à faire pour la matière
+    hours_todo: Optional[float] = None
+
+class MultiPlanningData(BaseModel):
+    # Classes planifiées ensemble, toutes sur la même grille de créneaux
+    classes: List[PlanningData]
+    # Salles partagées, s'ajoutent aux `rooms` de chaque classe
+    rooms: List[Room] = []
+
+class ReplanData(BaseModel):
+    planning_data: PlanningData
+    # Planning actuel, tel que retourné par /generate_planning
+    planning: List[List[str]]
+    changes: List[PlanningChange] = []
+
+class EvaluationData(BaseModel):
+    planning_data: PlanningData
+    # Plannings à évaluer, tels que retournés par /generate_planning (noms par jour)
+    plannings: List[List[List[str]]] = []
+    # Ou directement un id de matière par créneau (-1 pour vide), comme le format compact
+    schedules: List[List[int]] = []
+
+# --- Lignes de l'import en masse (voir importer.py) ---
+# Avec `id` la ligne met à jour cet enregistrement, sinon sa clé naturelle est utilisée
+
+class TeacherImport(BaseModel):
+    type: Literal["teacher"]
+    id: Optional[int] = None
+    first_name: str
+    last_name: str
+    email: Optional[str] = None
+
+class ClassImport(BaseModel):
+    type: Literal["class"]
+    id: Optional[int] = None
+    level: int
+    group: int
+    year_id: Optional[int] = None
+    major_id: Optional[int] = None
+
+class SubjectImport(BaseModel):
+    type: Literal["subject"]
+    id: Optional[int] = None
+    name: str
+    semester: int
+    coefficient: Optional[float] = None
+    ects: Optional[float] = None
+    class_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    # Enseignant désigné par son email quand son id n'est pas connu
+    teacher_email: Optional[str] = None
+
+ImportRecord = Annotated[Union[TeacherImport, ClassImport, SubjectImport], Field(discriminator="type")]
+
 
 Base = declarative_base()
 
@@ -159,4 +227,19 @@ class Document(Base):
 
     # CORRECTION: Ajout des relations manquantes
     academic_year = relationship("AcademicYear", back_populates="documents")
-    subject = relationship("Subject", back_populates="documents")
\ No newline at end of file
+    subject = relationship("Subject", back_populates="documents")
+
+class Planning(Base):
+    """Planning généré par le solveur, servi par /get_planning."""
+    __tablename__ = "plannings"
+    id = Column(Integer, primary_key=True, index=True)
+    class_name = Column(String, nullable=False)
+    week_number = Column(Integer, nullable=False)
+    algorithm = Column(String, nullable=False)
+    input_hash = Column(String(64), nullable=False)
+    planning = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_plannings_lookup", "class_name", "week_number", "algorithm", "input_hash"),
+    )
@@ -1,12 +1,74 @@
 import sys
 import os
 import ctypes
+import threading
 import numpy as np
 
-class Rustml:
+from metrics import PLANNING_STAGE_DURATION
+
+# Statuts des points d'entrée vérifiés (voir basic_function.rs)
+STATUS_OK = 0
+STATUS_INVALID_INPUT = 1
+STATUS_PANIC = 2
+# Côté Python : le résultat n'a pas la taille attendue
+STATUS_INVALID_RESULT = 3
+
+STATUS_MESSAGES = {
+    STATUS_INVALID_INPUT: "invalid input (negative count or length, missing buffer)",
+    STATUS_PANIC: "the solver panicked",
+    STATUS_INVALID_RESULT: "invalid result",
+}
+
+
+class NativeError(RuntimeError):
+    """
+    A native call failed, `status` is one of the STATUS_* codes.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ScratchBuffers(threading.local):
+    """
+    Per-thread input buffers for the native calls.
+    Each buffer grows to the largest request seen by its thread and is then reused,
+    so steady-state calls do not allocate new arrays.
+    """
     def __init__(self):
+        self.buffers = {}
+
+    def get(self, name: str, size: int, dtype=np.float32):
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(max(size, 1), dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer[:size]
+
+
+class Rustml:
+    """
+    Thread-safe wrapper of the Rust solvers, one instance shared by all the threads.
+    - max_concurrency: native calls running at once (default: one per core),
+      so that the solver, portfolio and job pools together never oversubscribe the cores
+    """
+    def __init__(self, max_concurrency: int = None):
+        # Chargée au premier appel (voir ensure_lib), pour un démarrage rapide des workers
         self.lib = None
-        self.load_lib()
+        self.scratch = ScratchBuffers()
+        self._lock = threading.Lock()
+        self.max_concurrency = max(max_concurrency or os.cpu_count() or 1, 1)
+        self.native_slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def ensure_lib(self):
+        """
+        Load the native library on first use, once even with concurrent callers.
+        """
+        if self.lib is None:
+            with self._lock:
+                if self.lib is None:
+                    self.load_lib()
+        return self.lib
 
     def load_lib(self):
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,132 +82,277 @@ class Rustml:
         else:
             raise Exception("Unsupported OS")
         
-        self.lib = ctypes.CDLL(lib_path)
+        lib = ctypes.CDLL(lib_path)
         
         # Function signatures
-        self.lib.add.argtypes = [ctypes.c_int, ctypes.c_int]
-        self.lib.add.restype = ctypes.c_int
+        lib.add.argtypes = [ctypes.c_int, ctypes.c_int]
+        lib.add.restype = ctypes.c_int
 
-        self.lib.generate_greedy_planning.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int,
-                                                      ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+        # Unavailability goes through the *_bits entry points, packed as uint64 words (see marshal_unavailability_bits).
+        # Checked entry points: they return a STATUS_* code and the schedule through
+        # the last two parameters (pointer, length), see call_native
+        lib.generate_greedy_planning_bits.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int,
                                                       ctypes.POINTER(ctypes.c_float), ctypes.c_int,
                                                       ctypes.POINTER(ctypes.c_float), ctypes.c_int,
-                                                      ctypes.POINTER(ctypes.c_float), ctypes.c_int]
-        self.lib.generate_greedy_planning.restype = ctypes.POINTER(ctypes.c_int)
+                                                      ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.generate_greedy_planning_bits.restype = ctypes.c_int
 
-        self.lib.generate_min_conflicts_planning.argtypes = [ctypes.c_int, ctypes.c_int,
-                                                             ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+        lib.generate_min_conflicts_planning_bits.argtypes = [ctypes.c_int, ctypes.c_int,
                                                              ctypes.POINTER(ctypes.c_float), ctypes.c_int,
                                                              ctypes.POINTER(ctypes.c_float), ctypes.c_int,
-                                                             ctypes.POINTER(ctypes.c_float), ctypes.c_int]
-        self.lib.generate_min_conflicts_planning.restype = ctypes.POINTER(ctypes.c_int)
+                                                             ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
+                                                             ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int),
+                                                             ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.generate_min_conflicts_planning_bits.restype = ctypes.c_int
 
-        self.lib.generate_greedy_mc_planning.argtypes = [ctypes.c_int, ctypes.c_float, ctypes.c_int,
+        lib.generate_greedy_mc_planning_bits.argtypes = [ctypes.c_int, ctypes.c_float, ctypes.c_int,
                                                          ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                         ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
                                                          ctypes.POINTER(ctypes.c_float), ctypes.c_int,
                                                          ctypes.POINTER(ctypes.c_float), ctypes.c_int,
-                                                         ctypes.POINTER(ctypes.c_float), ctypes.c_int,
-                                                         ctypes.POINTER(ctypes.c_float), ctypes.c_int]
-        self.lib.generate_greedy_mc_planning.restype = ctypes.POINTER(ctypes.c_int)
+                                                         ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.generate_greedy_mc_planning_bits.restype = ctypes.c_int
+
+        lib.generate_greedy_mc_horizon.argtypes = [ctypes.c_int, ctypes.c_float, ctypes.c_int, ctypes.c_int,
+                                                   ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                   ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
+                                                   ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                   ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                   ctypes.POINTER(ctypes.c_float),
+                                                   ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.generate_greedy_mc_horizon.restype = ctypes.c_int
+
+        lib.repair_planning_bits.argtypes = [ctypes.c_int, ctypes.c_int,
+                                             ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                             ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                             ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                             ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
+                                             ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.repair_planning_bits.restype = ctypes.c_int
+
+        lib.generate_multi_class_planning.argtypes = [ctypes.c_int, ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_float), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_uint64), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_int), ctypes.c_int,
+                                                      ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+                                                      ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.POINTER(ctypes.c_int)]
+        lib.generate_multi_class_planning.restype = ctypes.c_int
+
+        lib.free_planning.argtypes = [ctypes.POINTER(ctypes.c_int)]
+        lib.free_planning.restype = None
 
-        self.lib.free_planning.argtypes = [ctypes.POINTER(ctypes.c_int)]
-        self.lib.free_planning.restype = None
+        # Publiée une fois les signatures en place : ensure_lib ne verrouille pas en lecture
+        self.lib = lib
 
     def add(self, a, b):
-        if self.lib is None:
-            self.load_lib()
+        self.ensure_lib()
         return self.lib.add(a, b)
-    
+
+    # --- Marshalling layer shared by all the planning functions ---
+
+    @staticmethod
+    def float_ptr(array: np.ndarray):
+        return array.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+
+    @staticmethod
+    def int_ptr(array: np.ndarray):
+        return array.ctypes.data_as(ctypes.POINTER(ctypes.c_int))
+
+    @staticmethod
+    def uint64_ptr(array: np.ndarray):
+        return array.ctypes.data_as(ctypes.POINTER(ctypes.c_uint64))
+
+    def marshal_floats(self, name: str, values):
+        """
+        Copy values into the float32 scratch buffer `name`.
+        """
+        array = self.scratch.get(name, len(values))
+        array[:] = values
+        return array
+
+    def marshal_unavailability_bits(self, unavailability: list[list[float]], total_slots: int):
+        """
+        Pack the unavailability lists as bits: one row of ceil(total_slots / 64)
+        uint64 words per subject, bit `slot % 64` of word `slot // 64` set when the
+        subject is unavailable on `slot` (BitMatrix on the Rust side).
+        Slots outside the week are ignored.
+        """
+        words = (total_slots + 63) // 64
+        counts = np.fromiter(map(len, unavailability), dtype=np.intp, count=len(unavailability))
+        mask = self.scratch.get("unavailability_mask", len(unavailability) * words * 64, np.bool_)
+        mask[:] = False
+        mask = mask.reshape(len(unavailability), words * 64)
+        if counts.sum():
+            slots = np.concatenate([sublist for sublist in unavailability if len(sublist)]).astype(np.intp, copy=False)
+            rows = np.repeat(np.arange(len(unavailability)), counts)
+            valid = (slots >= 0) & (slots < total_slots)
+            mask[rows[valid], slots[valid]] = True
+        # Little endian bit and byte order, then native uint64 for the FFI
+        return np.packbits(mask, axis=1, bitorder="little").view("<u8").astype(np.uint64, copy=False).ravel()
+
+    def marshal_ints(self, name: str, values):
+        """
+        Copy values into the int32 scratch buffer `name`.
+        """
+        array = self.scratch.get(name, len(values), np.int32)
+        array[:] = values
+        return array
+
+    def call_native(self, algorithm: str, function, expected_len: int, *args):
+        """
+        Call a checked entry point and copy its schedule once into a NumPy array.
+        At most max_concurrency native calls run at once, the others wait here.
+        Raises NativeError if the status is not STATUS_OK or the schedule has
+        not expected_len values. The native buffer is always released.
+        """
+        out = ctypes.POINTER(ctypes.c_int)()
+        out_len = ctypes.c_int(-1)
+        with self.native_slots:
+            with PLANNING_STAGE_DURATION.time(stage="native", algorithm=algorithm):
+                status = function(*args, ctypes.byref(out), ctypes.byref(out_len))
+        try:
+            if status != STATUS_OK:
+                raise NativeError(status, f"{function.__name__}: {STATUS_MESSAGES.get(status, f'status {status}')}")
+            if out_len.value != expected_len or (expected_len > 0 and not out):
+                raise NativeError(STATUS_INVALID_RESULT,
+                                  f"{function.__name__}: {out_len.value} values returned, {expected_len} expected")
+            if expected_len == 0:
+                return np.empty(0, dtype=np.int32)
+            return np.ctypeslib.as_array(out, shape=(expected_len,)).copy()
+        finally:
+            if out:
+                self.lib.free_planning(out)
+
+    # --- Planning functions ---
+
     def generate_greedy_planning(self, total_slots: int, max_hours: int, slot_minutes: int, subjects: list[float], todo: list[float], unavailability: list[list[float]]):
-        if self.lib is None:
-            self.load_lib()
-        
-        # Convert lists to ctypes arrays
-        subject_numpy = np.array(subjects, dtype=np.float32)
-        subject_ptr = subject_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        todo_numpy = np.array(todo, dtype=np.float32)
-        todo_ptr = todo_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-        flat_unavailability = [item for sublist in unavailability for item in sublist]
-        unavailability_numpy = np.array(flat_unavailability, dtype=np.float32)
-        unavailability_ptr = unavailability_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        sub_unavailability = np.array([len(sublist) for sublist in unavailability], dtype=np.float32)
-        sub_unavailability_ptr = sub_unavailability.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-
-        result_ptr = self.lib.generate_greedy_planning(ctypes.c_int(total_slots), ctypes.c_int(max_hours), ctypes.c_int(slot_minutes), 
-                                                   subject_ptr, ctypes.c_int(len(subjects)), 
-                                                   todo_ptr, ctypes.c_int(len(todo)),
-                                                   unavailability_ptr, ctypes.c_int(len(flat_unavailability)),
-                                                   sub_unavailability_ptr, ctypes.c_int(len(sub_unavailability))
-                                                   )
-        
-        # Convert result to a Python list
-        arr_slice = ctypes.cast(result_ptr, ctypes.POINTER(ctypes.c_int * total_slots)).contents
-        result = list(arr_slice)
-
-        self.lib.free_planning(result_ptr)
-        return result
-    
-    def generate_min_conflicts_planning(self, total_slots: int, slot_minutes: int, subjects: list[float], todo: list[float], unavailability: list[list[float]]):
-        if self.lib is None:
-            self.load_lib()
-        
-        # Convert lists to ctypes arrays
-        subject_numpy = np.array(subjects, dtype=np.float32)
-        subject_ptr = subject_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        todo_numpy = np.array(todo, dtype=np.float32)
-        todo_ptr = todo_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-        flat_unavailability = [item for sublist in unavailability for item in sublist]
-        unavailability_numpy = np.array(flat_unavailability, dtype=np.float32)
-        unavailability_ptr = unavailability_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        sub_unavailability = np.array([len(sublist) for sublist in unavailability], dtype=np.float32)
-        sub_unavailability_ptr = sub_unavailability.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-        result_ptr = self.lib.generate_min_conflicts_planning(ctypes.c_int(total_slots), ctypes.c_int(slot_minutes), 
-                                                   subject_ptr, ctypes.c_int(len(subjects)), 
-                                                   todo_ptr, ctypes.c_int(len(todo)),
-                                                   unavailability_ptr, ctypes.c_int(len(flat_unavailability)),
-                                                   sub_unavailability_ptr, ctypes.c_int(len(sub_unavailability))
-                                                   )
-        
-        # Convert result to a Python list
-        arr_slice = ctypes.cast(result_ptr, ctypes.POINTER(ctypes.c_int * total_slots)).contents
-        result = list(arr_slice)
+        self.ensure_lib()
+
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="greedy"):
+            subject_numpy = self.marshal_floats("subjects", subjects)
+            todo_numpy = self.marshal_floats("todo", todo)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+
+        return self.call_native("greedy", self.lib.generate_greedy_planning_bits, total_slots,
+                                ctypes.c_int(total_slots), ctypes.c_int(max_hours), ctypes.c_int(slot_minutes),
+                                self.float_ptr(subject_numpy), ctypes.c_int(len(subject_numpy)),
+                                self.float_ptr(todo_numpy), ctypes.c_int(len(todo_numpy)),
+                                self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)))
+
+    def generate_min_conflicts_planning(self, total_slots: int, slot_minutes: int, subjects: list[float], todo: list[float], unavailability: list[list[float]], max_iterations: int = 1000, time_budget_ms: int = 0):
+        """
+        Min-conflicts search stopped after max_iterations or time_budget_ms (0: no time limit).
+        Returns the best schedule found and its conflict count.
+        """
+        self.ensure_lib()
+
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="min_conflicts"):
+            subject_numpy = self.marshal_floats("subjects", subjects)
+            todo_numpy = self.marshal_floats("todo", todo)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+            conflicts = ctypes.c_int(-1)
+
+        schedule = self.call_native("min_conflicts", self.lib.generate_min_conflicts_planning_bits, total_slots,
+                                    ctypes.c_int(total_slots), ctypes.c_int(slot_minutes),
+                                    self.float_ptr(subject_numpy), ctypes.c_int(len(subject_numpy)),
+                                    self.float_ptr(todo_numpy), ctypes.c_int(len(todo_numpy)),
+                                    self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)),
+                                    ctypes.c_int(max_iterations), ctypes.c_int(time_budget_ms), ctypes.byref(conflicts))
+        return schedule, conflicts.value
 
-        self.lib.free_planning(result_ptr)
-        return result
-    
     def generate_greedy_mc_planning(self, total_slots: int, max_weekly_hours: float, slot_minutes: int, subjects: list[float], unavailability: list[list[float]], hours_done: list[float], all_hours: list[float]):
-        if self.lib is None:
-            self.load_lib()
-        
-        # Convert lists to ctypes arrays
-        subject_numpy = np.array(subjects, dtype=np.float32)
-        subject_ptr = subject_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        hours_done_numpy = np.array(hours_done, dtype=np.float32)
-        hours_done_ptr = hours_done_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        all_hours_numpy = np.array(all_hours, dtype=np.float32)
-        all_hours_ptr = all_hours_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-        flat_unavailability = [item for sublist in unavailability for item in sublist]
-        unavailability_numpy = np.array(flat_unavailability, dtype=np.float32)
-        unavailability_ptr = unavailability_numpy.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-        sub_unavailability = np.array([len(sublist) for sublist in unavailability], dtype=np.float32)
-        sub_unavailability_ptr = sub_unavailability.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
-
-        result_ptr = self.lib.generate_greedy_mc_planning(ctypes.c_int(total_slots), ctypes.c_float(max_weekly_hours), ctypes.c_int(slot_minutes), 
-                                                   subject_ptr, ctypes.c_int(len(subjects)), 
-                                                   unavailability_ptr, ctypes.c_int(len(flat_unavailability)),
-                                                   sub_unavailability_ptr, ctypes.c_int(len(sub_unavailability)),
-                                                   hours_done_ptr, ctypes.c_int(len(hours_done)),
-                                                   all_hours_ptr, ctypes.c_int(len(all_hours))
-                                                   )
-        
-        # Convert result to a Python list
-        arr_slice = ctypes.cast(result_ptr, ctypes.POINTER(ctypes.c_int * total_slots)).contents
-        result = list(arr_slice)
+        self.ensure_lib()
+
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="greedy_mc"):
+            subject_numpy = self.marshal_floats("subjects", subjects)
+            hours_done_numpy = self.marshal_floats("hours_done", hours_done)
+            all_hours_numpy = self.marshal_floats("all_hours", all_hours)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+
+        return self.call_native("greedy_mc", self.lib.generate_greedy_mc_planning_bits, total_slots,
+                                ctypes.c_int(total_slots), ctypes.c_float(max_weekly_hours), ctypes.c_int(slot_minutes),
+                                self.float_ptr(subject_numpy), ctypes.c_int(len(subject_numpy)),
+                                self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)),
+                                self.float_ptr(hours_done_numpy), ctypes.c_int(len(hours_done_numpy)),
+                                self.float_ptr(all_hours_numpy), ctypes.c_int(len(all_hours_numpy)))
+
+    def generate_greedy_mc_horizon(self, total_slots: int, max_weekly_hours: float, slot_minutes: int, weeks: int, subjects: list[float], unavailability: list[list[float]], hours_done: list[float], all_hours: list[float]):
+        """
+        greedy_mc over `weeks` consecutive weeks in one native call, the hours
+        scheduled each week being added to hours_done for the next one.
+        Returns the schedules shaped (weeks, total_slots) and the hours done after the last week.
+        """
+        self.ensure_lib()
+
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="horizon"):
+            subject_numpy = self.marshal_floats("subjects", subjects)
+            hours_done_numpy = self.marshal_floats("hours_done", hours_done)
+            all_hours_numpy = self.marshal_floats("all_hours", all_hours)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+            hours_done_out = np.empty(len(hours_done), dtype=np.float32)
+
+        schedule = self.call_native("horizon", self.lib.generate_greedy_mc_horizon, weeks * total_slots,
+                                    ctypes.c_int(total_slots), ctypes.c_float(max_weekly_hours), ctypes.c_int(slot_minutes), ctypes.c_int(weeks),
+                                    self.float_ptr(subject_numpy), ctypes.c_int(len(subject_numpy)),
+                                    self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)),
+                                    self.float_ptr(hours_done_numpy), ctypes.c_int(len(hours_done_numpy)),
+                                    self.float_ptr(all_hours_numpy), ctypes.c_int(len(all_hours_numpy)),
+                                    self.float_ptr(hours_done_out))
+        return schedule.reshape(weeks, total_slots), hours_done_out
+
+    def repair_planning(self, total_slots: int, slot_minutes: int, current: list[int], subjects: list[float], todo: list[float], unavailability: list[list[float]]):
+        self.ensure_lib()
+
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="repair"):
+            current_numpy = self.marshal_ints("current", current)
+            subject_numpy = self.marshal_floats("subjects", subjects)
+            todo_numpy = self.marshal_floats("todo", todo)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+
+        return self.call_native("repair", self.lib.repair_planning_bits, total_slots,
+                                ctypes.c_int(total_slots), ctypes.c_int(slot_minutes),
+                                self.int_ptr(current_numpy), ctypes.c_int(len(current_numpy)),
+                                self.float_ptr(subject_numpy), ctypes.c_int(len(subject_numpy)),
+                                self.float_ptr(todo_numpy), ctypes.c_int(len(todo_numpy)),
+                                self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)))
+
+    def generate_multi_class_planning(self, total_slots: int, slot_minutes: int, class_subjects: list[int], class_max_hours: list[float], class_sizes: list[int], teachers: list[int], todo: list[float], unavailability: list[list[float]], room_capacities: list[int]):
+        """
+        Schedule several classes sharing teachers and rooms.
+        - class_subjects: subject count of each class, the subject lists hold every class one after the other
+        - teachers: teacher id of each subject (-1: none)
+        - room_capacities: capacity of each shared room, empty for no room constraint
+        Returns the schedules and room ids, both shaped (classes, total_slots), and the number of lessons left unplaced.
+        """
+        self.ensure_lib()
+
+        classes_len = len(class_subjects)
+        with PLANNING_STAGE_DURATION.time(stage="marshal", algorithm="multi_class"):
+            class_subjects_numpy = self.marshal_ints("class_subjects", class_subjects)
+            class_max_hours_numpy = self.marshal_floats("class_max_hours", class_max_hours)
+            class_sizes_numpy = self.marshal_ints("class_sizes", class_sizes)
+            teachers_numpy = self.marshal_ints("teachers", teachers)
+            todo_numpy = self.marshal_floats("todo", todo)
+            unavailability_numpy = self.marshal_unavailability_bits(unavailability, total_slots)
+            room_capacities_numpy = self.marshal_ints("room_capacities", room_capacities)
+            # Une grille invalide est refusée côté Rust (STATUS_INVALID_INPUT)
+            rooms = np.empty(max(classes_len * total_slots, 1), dtype=np.int32)
+            unplaced = ctypes.c_int(-1)
 
-        self.lib.free_planning(result_ptr)
-        return result
\ No newline at end of file
+        schedule = self.call_native("multi_class", self.lib.generate_multi_class_planning, classes_len * total_slots,
+                                    ctypes.c_int(total_slots), ctypes.c_int(slot_minutes),
+                                    self.int_ptr(class_subjects_numpy), ctypes.c_int(classes_len),
+                                    self.float_ptr(class_max_hours_numpy), ctypes.c_int(classes_len),
+                                    self.int_ptr(class_sizes_numpy), ctypes.c_int(classes_len),
+                                    self.int_ptr(teachers_numpy), ctypes.c_int(len(teachers_numpy)),
+                                    self.float_ptr(todo_numpy), ctypes.c_int(len(todo_numpy)),
+                                    self.uint64_ptr(unavailability_numpy), ctypes.c_int(len(unavailability_numpy)),
+                                    self.int_ptr(room_capacities_numpy), ctypes.c_int(len(room_capacities_numpy)),
+                                    self.int_ptr(rooms), ctypes.byref(unplaced))
+        rooms = rooms[:classes_len * total_slots]
+        return schedule.reshape(classes_len, total_slots), rooms.reshape(classes_len, total_slots), unplaced.value
@@ -0,0 +1,110 @@
+import numpy as np
+
+import models
+
+# Poids des critères dans le score (plus petit = meilleur)
+UNAVAILABILITY_WEIGHT = 10.0
+UNMET_HOURS_WEIGHT = 1.0
+EXTRA_HOURS_WEIGHT = 1.0
+MAX_HOURS_OVERFLOW_WEIGHT = 10.0
+GAP_WEIGHT = 0.5
+
+
+def score_planning(resultat, planning_data: models.PlanningData, slot_hours: float):
+    """
+    Score a raw schedule (one subject id per slot, -1 for empty).
+    - unmet_hours / extra_hours: hours_todo not covered / exceeded by the schedule
+    - unavailability_violations: slots given to a subject during its unavailable periods
+    - max_hours_overflow: hours scheduled beyond params.max_hours_per_week
+    - gaps: empty slots between two lessons of the same day
+    score is the weighted sum of these, lower is better (see evaluate_plannings).
+    """
+    evaluation = evaluate_plannings([resultat], planning_data, slot_hours)
+    return {
+        "score": float(evaluation["score"][0]),
+        "unmet_hours": float(evaluation["unmet_hours"][0]),
+        "extra_hours": float(evaluation["extra_hours"][0]),
+        "unavailability_violations": int(evaluation["unavailability_violations"][0]),
+        "max_hours_overflow": float(evaluation["max_hours_overflow"][0]),
+        "gaps": int(evaluation["gaps"][0]),
+    }
+
+
+def stack_schedules(plannings: list, schedules: list, planning_data: models.PlanningData):
+    """
+    Plannings as returned by /generate_planning (names grouped by day), then raw
+    schedules (one subject id per slot), as one planning x slot matrix of ids.
+    As in repair, unknown names become empty slots and each planning is cut or
+    padded to the week's slots.
+    """
+    total_slots = planning_data.params.slots_per_day * planning_data.params.days_per_week
+    ids = {}
+    for index, subject in enumerate(planning_data.subjects):
+        ids.setdefault(subject.name, index)
+    named = np.full((len(plannings), total_slots), -1, dtype=np.int64)
+    for row, planning in enumerate(plannings):
+        current = [ids.get(name, -1) for day in planning for name in day][:total_slots]
+        named[row, :len(current)] = current
+    return np.concatenate([named, np.asarray(schedules, dtype=np.int64).reshape(-1, total_slots)])
+
+
+def evaluate_plannings(schedules, planning_data: models.PlanningData, slot_hours: float):
+    """
+    Evaluate many raw schedules of the same class at once, schedules being a
+    planning x slot matrix of subject ids (-1 for empty).
+    Every criterion is an array with one value (or row) per planning:
+    - score: weighted sum of the violations, unmet and extra hours, gaps and
+      max_hours_overflow, lower is better. load_imbalance is reported only.
+    - unavailability_violations: slots given to a subject during its unavailable periods
+    - scheduled_hours: hours scheduled per subject, unmet_hours / extra_hours against hours_todo
+    - day_hours: hours scheduled per day, load_imbalance their standard deviation
+    - gaps: empty slots between two lessons of the same day
+    - max_hours_overflow: hours scheduled beyond params.max_hours_per_week
+    """
+    params = planning_data.params
+    slots_per_day = params.slots_per_day
+    subjects_len = len(planning_data.subjects)
+    schedules = np.asarray(schedules, dtype=np.int64).reshape(-1, slots_per_day * params.days_per_week)
+    count, total_slots = schedules.shape
+    # Ids hors des matières connues : créneaux vides
+    schedules = np.where((schedules >= 0) & (schedules < subjects_len), schedules, -1)
+
+    # Hours scheduled per subject: one bincount over all plannings, the -1 id shifted to column 0
+    offsets = (schedules + 1) + (subjects_len + 1) * np.arange(count)[:, None]
+    counts = np.bincount(offsets.ravel(), minlength=count * (subjects_len + 1)).reshape(count, subjects_len + 1)
+    scheduled = counts[:, 1:] * slot_hours
+    todo = np.array([subject.hours_todo for subject in planning_data.subjects], dtype=np.float64)
+    unmet_hours = np.clip(todo - scheduled, 0, None).sum(axis=1)
+    extra_hours = np.clip(scheduled - todo, 0, None).sum(axis=1)
+
+    # Unavailability as a (subject + empty) x slot mask, read at each scheduled id
+    unavailable = np.zeros((subjects_len + 1, total_slots), dtype=bool)
+    for subject_id, subject in enumerate(planning_data.subjects):
+        periods = np.asarray(subject.unavailable_periods, dtype=np.int64)
+        unavailable[subject_id + 1, periods[(periods >= 0) & (periods < total_slots)]] = True
+    violations = unavailable[schedules + 1, np.arange(total_slots)].sum(axis=1)
+
+    # Per day: load and empty slots between the first and last lesson
+    busy = (schedules >= 0).reshape(count, -1, slots_per_day)
+    lessons = busy.sum(axis=2)
+    day_hours = lessons * slot_hours
+    first = np.argmax(busy, axis=2)
+    last = slots_per_day - 1 - np.argmax(busy[:, :, ::-1], axis=2)
+    span = np.where(busy.any(axis=2), last - first + 1, 0)
+    gaps = (span - lessons).sum(axis=1)
+
+    max_hours_overflow = np.clip(day_hours.sum(axis=1) - params.max_hours_per_week, 0, None)
+
+    return {
+        "score": (UNAVAILABILITY_WEIGHT * violations + UNMET_HOURS_WEIGHT * unmet_hours
+                  + EXTRA_HOURS_WEIGHT * extra_hours + MAX_HOURS_OVERFLOW_WEIGHT * max_hours_overflow
+                  + GAP_WEIGHT * gaps),
+        "unavailability_violations": violations,
+        "unmet_hours": unmet_hours,
+        "extra_hours": extra_hours,
+        "scheduled_hours": scheduled,
+        "day_hours": day_hours,
+        "load_imbalance": day_hours.std(axis=1),
+        "gaps": gaps,
+        "max_hours_overflow": max_hours_overflow,
+    }
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,11 +8,52 @@ class Settings(BaseSettings):
     Utilise Pydantic pour la validation des types.
     """
     # --- Configuration de la base de données PostgreSQL ---
-    POSTGRES_SERVER: str
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
-    POSTGRES_DB: str
-    DATABASE_URL: str
+    # Optionnelles : sans DATABASE_URL l'API démarre, seuls les endpoints
+    # utilisant la base échouent (voir db.session)
+    POSTGRES_SERVER: Optional[str] = None
+    POSTGRES_USER: Optional[str] = None
+    POSTGRES_PASSWORD: Optional[str] = None
+    POSTGRES_DB: Optional[str] = None
+    DATABASE_URL: Optional[str] = None
+    # URL du moteur asynchrone, déduite de DATABASE_URL si vide (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Pool de connexions (ignoré pour SQLite), appliqué à chaque moteur
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
+    # --- Configuration du solveur ---
+    # Nombre de threads utilisés pour les appels au solveur Rust
+    SOLVER_WORKERS: int = os.cpu_count() or 1
+    # Appels natifs simultanés, tous pools confondus (solveur, portfolio, jobs)
+    NATIVE_MAX_CONCURRENCY: int = os.cpu_count() or 1
+
+    # --- Cache des plannings générés ---
+    CACHE_MAX_SIZE: int = 1024
+    CACHE_TTL_SECONDS: float = 3600
+    # Pages de /teachers gardées en mémoire : invalidées par les imports de ce
+    # processus, les autres écritures ne sont vues qu'après le TTL
+    TEACHER_CACHE_MAX_SIZE: int = 256
+    TEACHER_CACHE_TTL_SECONDS: float = 30
+
+    # --- File de jobs pour les plannings longs ---
+    JOBS_WORKERS: int = 2
+    JOBS_MAX_QUEUE: int = 100
+    JOBS_RESULT_TTL_SECONDS: float = 3600
+
+    # --- Import en masse (/import et importer.py) ---
+    # Lignes validées et écrites par transaction
+    IMPORT_BATCH_SIZE: int = 1000
+
+    # --- Profilage à la demande (en-tête X-Profile: 1) ---
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_MS: float = 5
+
+    # --- Démarrage ---
+    # Charge la librairie Rust et les données puis lance un petit calcul de
+    # chaque solveur au démarrage, en tâche de fond (voir /ready)
+    WARMUP_ENABLED: bool = True
 
     class Config:
         # Spécifie le fichier .env à charger
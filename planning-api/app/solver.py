@@ -0,0 +1,378 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+import basic_function as fn
+import models
+import scoring
+from cache import planning_cache, planning_flights
+from metrics import PLANNING_STAGE_DURATION, bind_profiler
+from settings import settings
+
+SLOT_MINUTES = 90
+
+# Pool partagé pour les appels au solveur Rust.
+# ctypes relâche le GIL pendant l'appel natif, des threads suffisent donc
+# pour exploiter tous les coeurs.
+executor = ThreadPoolExecutor(max_workers=settings.SOLVER_WORKERS, thread_name_prefix="solver")
+# Pool séparé pour le mode portfolio : une requête portfolio peut elle-même
+# tourner sur `executor` (batch) et ne doit pas attendre ses propres threads.
+portfolio_executor = ThreadPoolExecutor(max_workers=settings.SOLVER_WORKERS, thread_name_prefix="portfolio")
+
+PORTFOLIO_ALGORITHMS = ("greedy", "greedy_mc", "min_conflicts")
+
+
+def build_subject_dict(planning_data: models.PlanningData):
+    """
+    Map solver subject ids to their input subject.
+    The -1 id is the empty slot returned by the solvers.
+    """
+    subject_dict = {index: subject for index, subject in enumerate(planning_data.subjects)}
+    subject_dict[-1] = models.InputSubject.create_empty(models.InputSubject)
+    return subject_dict
+
+
+def run_solver(rustml, planning_data: models.PlanningData, subject_dict: dict):
+    """
+    Call the Rust solver selected by `planning_data.params.algorithm`.
+    Returns the raw schedule (one subject id per slot) and solver specific
+    details, such as the final conflict count of min_conflicts.
+    """
+    total_slots = planning_data.params.slots_per_day * planning_data.params.days_per_week
+    max_hours = planning_data.params.max_hours_per_week
+    # The empty subject (-1) is only used to read the result back, the solvers
+    # add it by themselves.
+    subjects = list(range(len(planning_data.subjects)))
+    todo = [subject.hours_todo for subject in planning_data.subjects]
+    dones = [subject.hours_done for subject in planning_data.subjects]
+    total = [subject.hours_total for subject in planning_data.subjects]
+    unavailability = [subject.unavailable_periods for subject in planning_data.subjects]
+
+    if planning_data.params.algorithm == "portfolio":
+        return run_portfolio(rustml, planning_data, subject_dict)
+    if planning_data.params.algorithm == "greedy":
+        return rustml.generate_greedy_planning(
+            total_slots=total_slots,
+            max_hours=max_hours,
+            slot_minutes=SLOT_MINUTES,
+            subjects=subjects,
+            todo=todo,
+            unavailability=unavailability
+        ), {}
+    if planning_data.params.algorithm == "min_conflicts":
+        resultat, conflicts = rustml.generate_min_conflicts_planning(
+            total_slots=total_slots,
+            slot_minutes=SLOT_MINUTES,
+            subjects=subjects,
+            todo=todo,
+            unavailability=unavailability,
+            max_iterations=planning_data.params.max_iterations,
+            time_budget_ms=planning_data.params.time_budget_ms or 0
+        )
+        return resultat, {"conflicts": conflicts}
+    # Greedy MC algorithm as default
+    return rustml.generate_greedy_mc_planning(
+        total_slots=total_slots,
+        max_weekly_hours=max_hours,
+        slot_minutes=SLOT_MINUTES,
+        subjects=subjects, unavailability=unavailability,
+        hours_done=dones, all_hours=total
+    ), {}
+
+
+def run_portfolio(rustml, planning_data: models.PlanningData, subject_dict: dict):
+    """
+    Run every solver of PORTFOLIO_ALGORITHMS concurrently and keep the best
+    scored schedule (see scoring.score_planning).
+    With params.portfolio_deadline_ms, once the deadline has passed the best
+    schedule finished so far wins (waiting for the first one if none is done).
+    Failed solvers are reported, the call only raises when all of them failed.
+    A schedule with a zero score wins as soon as it is found.
+    When the deadline abandons solvers, the details have deadline_reached.
+    """
+    start = time.perf_counter()
+    slot_hours = SLOT_MINUTES / 60
+
+    def run(algorithm: str):
+        candidate = planning_data.model_copy(update={"params": planning_data.params.model_copy(update={"algorithm": algorithm})})
+        solver_start = time.perf_counter()
+        resultat, details = run_solver(rustml, candidate, subject_dict)
+        elapsed_ms = (time.perf_counter() - solver_start) * 1000
+        report = {"algorithm": algorithm, "elapsed_ms": round(elapsed_ms, 3), **details,
+                  **scoring.score_planning(resultat, planning_data, slot_hours)}
+        return resultat, report
+
+    futures = {portfolio_executor.submit(bind_profiler(run), algorithm): algorithm for algorithm in PORTFOLIO_ALGORITHMS}
+    deadline_ms = planning_data.params.portfolio_deadline_ms
+    deadline = start + deadline_ms / 1000 if deadline_ms is not None else None
+
+    done, pending = set(), set(futures)
+    deadline_reached = False
+    while pending:
+        # Deadline passed with no schedule yet: block until the next solver finishes
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        timeout = remaining if remaining is not None and remaining > 0 else None
+        finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        done |= finished
+        if any(not f.exception() and f.result()[1]["score"] == 0 for f in finished):
+            break
+        # A failed solver does not count, the others may still give a schedule
+        if deadline is not None and time.perf_counter() >= deadline and any(not f.exception() for f in done):
+            deadline_reached = bool(pending)
+            break
+
+    results = [f.result() for f in done if not f.exception()]
+    if not results:
+        raise next(iter(done)).exception()
+    for future in pending:
+        # Native solves cannot be interrupted, only the ones not started yet are dropped
+        future.cancel()
+
+    resultat, best = min(results, key=lambda r: r[1]["score"])
+    reports = [report for _, report in results]
+    reports += [{"algorithm": futures[f], "status": "pending"} for f in pending]
+    reports += [{"algorithm": futures[f], "error": str(f.exception())} for f in done if f.exception()]
+    details = {"algorithm": best["algorithm"], "portfolio": reports}
+    if deadline_reached:
+        details["deadline_reached"] = True
+    return resultat, details
+
+
+def prettify_planning(resultat, subject_dict: dict, slots_per_day: int):
+    """
+    Turn the raw schedule into subject names grouped by day.
+    """
+    # subject_dict keys are 0..n-1 then -1, so the -1 id lands on the empty subject
+    names = np.array([subject.name for subject in subject_dict.values()], dtype=object)
+    return names[np.asarray(resultat)].reshape(-1, slots_per_day).tolist()
+
+
+def solve_planning(rustml, planning_data: models.PlanningData):
+    """
+    Solve one class.
+    Returns a dict with the raw schedule (one subject index per slot, -1 for
+    empty), the subject names, the solver time in ms and the solver specific
+    details (see run_solver). planning_to_json gives the JSON form.
+    """
+    algorithm = planning_data.params.algorithm
+    with PLANNING_STAGE_DURATION.time(stage="subject_dict", algorithm=algorithm):
+        subject_dict = build_subject_dict(planning_data)
+    start = time.perf_counter()
+    resultat, details = run_solver(rustml, planning_data, subject_dict)
+    elapsed = time.perf_counter() - start
+    PLANNING_STAGE_DURATION.observe(elapsed, stage="solve", algorithm=algorithm)
+    # Shared through the planning cache
+    resultat.flags.writeable = False
+    return {
+        "schedule": resultat,
+        "subjects": [subject.name for subject in planning_data.subjects],
+        "elapsed_ms": round(elapsed * 1000, 3),
+        **details,
+    }
+
+
+def planning_to_json(result: dict, params: models.Params):
+    """
+    JSON form of a solve_planning result: the schedule becomes subject names
+    grouped by day, under `planning`.
+    """
+    with PLANNING_STAGE_DURATION.time(stage="prettify", algorithm=params.algorithm):
+        # The -1 index lands on the last name, the empty subject
+        names = np.array([*result["subjects"], "empty"], dtype=object)
+        planning = names[result["schedule"]].reshape(-1, params.slots_per_day).tolist()
+    return {
+        "planning": planning,
+        **{key: value for key, value in result.items() if key not in ("schedule", "subjects")},
+    }
+
+
+def solve_multi_class(rustml, multi: models.MultiPlanningData):
+    """
+    Solve several classes at once, teachers (by InputSubject.teacher) and rooms
+    being shared: no teacher or room is given two lessons in the same slot.
+    The shared rooms are multi.rooms plus the rooms of every class, by name.
+    Returns one planning per class, with the room of each slot, and the number
+    of lessons that could not be placed.
+    """
+    params = multi.classes[0].params
+    slots_per_day = params.slots_per_day
+    total_slots = slots_per_day * params.days_per_week
+
+    rooms = {}
+    for room in multi.rooms + [room for planning_data in multi.classes for room in planning_data.rooms]:
+        rooms.setdefault(room.name, room)
+    teacher_ids = {}
+    teachers = []
+    for planning_data in multi.classes:
+        for subject in planning_data.subjects:
+            teachers.append(teacher_ids.setdefault(subject.teacher, len(teacher_ids)) if subject.teacher else -1)
+    subjects = [subject for planning_data in multi.classes for subject in planning_data.subjects]
+
+    start = time.perf_counter()
+    resultat, room_ids, unplaced = rustml.generate_multi_class_planning(
+        total_slots=total_slots,
+        slot_minutes=SLOT_MINUTES,
+        class_subjects=[len(planning_data.subjects) for planning_data in multi.classes],
+        class_max_hours=[planning_data.params.max_hours_per_week for planning_data in multi.classes],
+        class_sizes=[planning_data.params.class_size for planning_data in multi.classes],
+        teachers=teachers,
+        todo=[subject.hours_todo for subject in subjects],
+        unavailability=[subject.unavailable_periods for subject in subjects],
+        room_capacities=[room.capacity for room in rooms.values()]
+    )
+    elapsed = time.perf_counter() - start
+    PLANNING_STAGE_DURATION.observe(elapsed, stage="solve", algorithm="multi_class")
+
+    with PLANNING_STAGE_DURATION.time(stage="prettify", algorithm="multi_class"):
+        # Room id -1 (no room) lands on the last name, like the empty subject
+        room_names = np.array([*rooms, ""], dtype=object)
+        plannings = [
+            {
+                "class_name": planning_data.params.class_name,
+                "planning": prettify_planning(resultat[index], build_subject_dict(planning_data), slots_per_day),
+                "rooms": room_names[room_ids[index]].reshape(-1, slots_per_day).tolist(),
+            }
+            for index, planning_data in enumerate(multi.classes)
+        ]
+    return {
+        "plannings": plannings,
+        "unplaced": unplaced,
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
+
+
+def solve_horizon(rustml, planning_data: models.PlanningData, weeks: int):
+    """
+    Solve `weeks` consecutive weeks of one class with greedy_mc in one native
+    call, hours_done being carried from one week to the next.
+    Returns the subject names and the schedule, a week x slot matrix of indexes
+    into them (-1 for an empty slot), with the hours done after the last week.
+    """
+    params = planning_data.params
+    total_slots = params.slots_per_day * params.days_per_week
+    start = time.perf_counter()
+    resultat, hours_done = rustml.generate_greedy_mc_horizon(
+        total_slots=total_slots,
+        max_weekly_hours=params.max_hours_per_week,
+        slot_minutes=SLOT_MINUTES,
+        weeks=weeks,
+        subjects=list(range(len(planning_data.subjects))),
+        unavailability=[subject.unavailable_periods for subject in planning_data.subjects],
+        hours_done=[subject.hours_done for subject in planning_data.subjects],
+        all_hours=[subject.hours_total for subject in planning_data.subjects]
+    )
+    elapsed = time.perf_counter() - start
+    PLANNING_STAGE_DURATION.observe(elapsed, stage="solve", algorithm="horizon")
+    return {
+        "schedule": resultat,
+        "subjects": [subject.name for subject in planning_data.subjects],
+        "hours_done": hours_done.tolist(),
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
+
+
+def warm_up(rustml):
+    """
+    Load the native library and run each solver once on a tiny class, without
+    going through the planning cache.
+    """
+    rustml.ensure_lib()
+    planning_data = models.PlanningData(
+        params=models.Params(class_name="warm-up", slots_per_day=2, days_per_week=2, max_hours_per_week=35,
+                             max_iterations=10),
+        subjects=[models.InputSubject(name="warm-up", teacher="warm-up", hours_todo=1.5, hours_done=0,
+                                      hours_total=15, unavailable_periods=[1])],
+        rooms=[],
+    )
+    subject_dict = build_subject_dict(planning_data)
+    for algorithm in PORTFOLIO_ALGORITHMS:
+        candidate = planning_data.model_copy(update={"params": planning_data.params.model_copy(update={"algorithm": algorithm})})
+        run_solver(rustml, candidate, subject_dict)
+    rustml.generate_greedy_mc_horizon(
+        total_slots=4, max_weekly_hours=35, slot_minutes=SLOT_MINUTES, weeks=1, subjects=[0],
+        unavailability=[[1]], hours_done=[0.0], all_hours=[15.0])
+
+
+def solve_planning_cached(rustml, planning_data: models.PlanningData, bypass: bool = False, key: str = None):
+    """
+    Same as solve_planning, behind the planning cache.
+    Concurrent misses of the same key wait for the solve already running and
+    share its result (status COALESCED) instead of calling the solver again.
+    - bypass: skip the lookup but still store the fresh result.
+    - key: hash_planning_data of planning_data, if already computed.
+    Returns the solve_planning result and the cache status (HIT, MISS, BYPASS or COALESCED).
+    """
+    key = key or fn.hash_planning_data(planning_data)
+    if not bypass:
+        result = planning_cache.get(key)
+        if result is not None:
+            return result, "HIT"
+
+    def solve():
+        result = solve_planning(rustml, planning_data)
+        # A portfolio cut by its deadline depends on timing, it is not cached
+        if not result.get("deadline_reached"):
+            planning_cache.set(key, result)
+        return result
+
+    result, shared = planning_flights.do(key, solve)
+    if shared:
+        return result, "COALESCED"
+    return result, "BYPASS" if bypass else "MISS"
+
+
+def apply_changes(planning_data: models.PlanningData, changes: list[models.PlanningChange]):
+    """
+    Return a copy of planning_data with the changes applied.
+    Unavailable periods go to the subjects matching by name or teacher,
+    hours_todo only to the subjects matching by name.
+    """
+    planning_data = planning_data.model_copy(deep=True)
+    for change in changes:
+        for subject in planning_data.subjects:
+            if change.unavailable_periods and change.name in (subject.name, subject.teacher):
+                subject.unavailable_periods.extend(change.unavailable_periods)
+            if change.hours_todo is not None and subject.name == change.name:
+                subject.hours_todo = change.hours_todo
+    return planning_data
+
+
+def repair_planning(rustml, planning_data: models.PlanningData, planning: list[list[str]]):
+    """
+    Repair an existing planning for the current planning_data: only the slots
+    that became invalid, or that are needed for missing hours, are changed.
+    Returns the new planning and the list of changed slots.
+    """
+    subject_dict = build_subject_dict(planning_data)
+    slots_per_day = planning_data.params.slots_per_day
+    total_slots = slots_per_day * planning_data.params.days_per_week
+
+    # Names back to solver ids, unknown names become empty slots
+    ids = {}
+    for index, subject in enumerate(planning_data.subjects):
+        ids.setdefault(subject.name, index)
+    current = [ids.get(name, -1) for day in planning for name in day][:total_slots]
+    current += [-1] * (total_slots - len(current))
+
+    resultat = rustml.repair_planning(
+        total_slots=total_slots,
+        slot_minutes=SLOT_MINUTES,
+        current=current,
+        subjects=list(range(len(planning_data.subjects))),
+        todo=[subject.hours_todo for subject in planning_data.subjects],
+        unavailability=[subject.unavailable_periods for subject in planning_data.subjects]
+    )
+
+    changed = np.flatnonzero(np.asarray(current) != resultat)
+    diff = [
+        {
+            "slot": int(slot),
+            "day": int(slot) // slots_per_day,
+            "period": int(slot) % slots_per_day,
+            "before": subject_dict[current[slot]].name,
+            "after": subject_dict[int(resultat[slot])].name,
+        }
+        for slot in changed
+    ]
+    return prettify_planning(resultat, subject_dict, slots_per_day), diff
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de l'API s'importent à plat, comme dans le conteneur (PYTHONPATH=/app)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
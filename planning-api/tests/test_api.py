@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+BODY = {
+    "params": {"class_name": "5A", "slots_per_day": 4, "days_per_week": 2, "max_hours_per_week": 12},
+    "subjects": [{"name": "Maths", "teacher": "A", "hours_todo": 3, "hours_done": 0, "hours_total": 30,
+                  "unavailable_periods": []}],
+    "rooms": [],
+}
+
+
+def generate(**params):
+    return client.post("/generate_planning", json={**BODY, "params": {**BODY["params"], **params}})
+
+
+def test_generate_planning():
+    response = generate()
+    assert response.status_code == 200
+    assert response.json()["planning"] == [["Maths", "Maths", "empty", "empty"], ["empty"] * 4]
+
+
+@pytest.mark.parametrize("params", [
+    {"slots_per_day": 0},
+    {"days_per_week": 0},
+    {"slots_per_day": -4},
+    {"slots_per_day": -4, "days_per_week": -2},
+    {"max_hours_per_week": -1},
+])
+def test_invalid_grid_is_rejected(params):
+    response = generate(**params)
+    assert response.status_code == 422
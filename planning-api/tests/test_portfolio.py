@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+import pytest
+
+import solver
+from test_scoring import make_planning_data
+
+# Meets hours_todo exactly on the class of make_planning_data: score 0
+EXACT = [0, 0, 0, 1, 1, -1, -1, -1]
+# Nothing scheduled: every hour is unmet
+EMPTY = [-1] * 8
+
+
+def fake_solvers(monkeypatch, behaviours: dict):
+    """
+    Replace the native solvers with behaviours[algorithm] = (delay in s, schedule or exception).
+    """
+    def run_solver(rustml, planning_data, subject_dict):
+        delay, outcome = behaviours[planning_data.params.algorithm]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return np.array(outcome, dtype=np.int32), {}
+    monkeypatch.setattr(solver, "run_solver", run_solver)
+
+
+def run_portfolio(**params):
+    planning_data = make_planning_data("portfolio", **params)
+    return solver.run_portfolio(None, planning_data, solver.build_subject_dict(planning_data))
+
+
+def test_failed_solver_does_not_end_the_portfolio(monkeypatch):
+    # greedy fails before the deadline, greedy_mc finishes after it
+    fake_solvers(monkeypatch, {"greedy": (0, RuntimeError("boom")), "greedy_mc": (0.1, EXACT),
+                               "min_conflicts": (0.3, EMPTY)})
+    resultat, details = run_portfolio(portfolio_deadline_ms=10)
+    assert resultat.tolist() == EXACT
+    assert details["algorithm"] == "greedy_mc"
+    assert {"algorithm": "greedy", "error": "boom"} in details["portfolio"]
+
+
+def test_portfolio_raises_when_every_solver_failed(monkeypatch):
+    fake_solvers(monkeypatch, {algorithm: (0.01, RuntimeError(algorithm)) for algorithm in solver.PORTFOLIO_ALGORITHMS})
+    with pytest.raises(RuntimeError):
+        run_portfolio(portfolio_deadline_ms=1)
+
+
+def test_zero_score_stops_the_portfolio(monkeypatch):
+    fake_solvers(monkeypatch, {"greedy": (0, EXACT), "greedy_mc": (0.5, EMPTY), "min_conflicts": (0.5, EMPTY)})
+    resultat, details = run_portfolio()
+    # Returned without waiting for the two slow solvers
+    assert details["algorithm"] == "greedy"
+    assert [report.get("status") for report in details["portfolio"]].count("pending") == 2
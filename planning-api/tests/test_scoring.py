@@ -0,0 +1,44 @@
+import models
+import scoring
+import solver
+from main import rustml
+
+
+def make_planning_data(algorithm: str = "greedy", **params):
+    return models.PlanningData(
+        params=models.Params(**{"class_name": "5A", "slots_per_day": 4, "days_per_week": 2,
+                                "max_hours_per_week": 12, "algorithm": algorithm, **params}),
+        subjects=[
+            models.InputSubject(name="Maths", teacher="A", hours_todo=4.5, hours_done=0, hours_total=30,
+                                unavailable_periods=[5]),
+            models.InputSubject(name="Fr", teacher="B", hours_todo=3, hours_done=0, hours_total=30,
+                                unavailable_periods=[]),
+        ],
+        rooms=[],
+    )
+
+
+def test_exact_schedule_scores_zero():
+    # 3 slots of Maths and 2 of Fr: 4.5h and 3h with 90 min slots
+    schedule = [0, 0, 0, 1, 1, -1, -1, -1]
+    score = scoring.score_planning(schedule, make_planning_data(), solver.SLOT_MINUTES / 60)
+    assert score == {"score": 0.0, "unmet_hours": 0.0, "extra_hours": 0.0, "unavailability_violations": 0,
+                     "max_hours_overflow": 0.0, "gaps": 0}
+
+
+def test_overfilled_schedule_is_penalised():
+    # Maths on its unavailable slot 5, 4.5h too many in all
+    schedule = [0, 0, 0, 0, 1, 0, 1, 1]
+    score = scoring.score_planning(schedule, make_planning_data(), solver.SLOT_MINUTES / 60)
+    assert score["extra_hours"] == 4.5
+    assert score["max_hours_overflow"] == 0.0
+    assert score["unavailability_violations"] == 1
+    assert score["score"] > 0
+
+
+def test_solver_hours_match_scoring():
+    # Solvers and scoring count a 90 min slot as 1.5h: a greedy planning meets hours_todo exactly
+    planning_data = make_planning_data()
+    result = solver.solve_planning(rustml, planning_data)
+    score = scoring.score_planning(result["schedule"], planning_data, solver.SLOT_MINUTES / 60)
+    assert (score["unmet_hours"], score["extra_hours"], score["unavailability_violations"]) == (0.0, 0.0, 0)
@@ -1,22 +1,95 @@
+use std::panic::{catch_unwind, AssertUnwindSafe};
+
 #[unsafe(no_mangle)]
 pub extern "C" fn add(left: u64, right: u64) -> u64 {
     left + right
 }
 
+/// Status codes of the checked entry points (`*_bits`, horizon, multi class).
+pub const STATUS_OK: i32 = 0;
+/// A count or a length is negative, or a pointer needed is null.
+pub const STATUS_INVALID_INPUT: i32 = 1;
+/// The solver panicked, the panic was stopped at the FFI boundary.
+pub const STATUS_PANIC: i32 = 2;
+
+/// Hand a schedule over to the caller, to be released with free_planning.
+/// Its length is stored just before the first value, so that free_planning
+/// gives back the exact allocation.
+pub fn into_raw_schedule(schedule: Vec<i32>) -> *const i32 {
+    let mut buffer = Vec::with_capacity(schedule.len() + 1);
+    buffer.push(schedule.len() as i32);
+    buffer.extend(schedule);
+    let base = Box::into_raw(buffer.into_boxed_slice()) as *mut i32;
+    unsafe { base.add(1) }
+}
+
 #[unsafe(no_mangle)]
 pub extern "C" fn free_planning(ptr: *const i32) {
     if ptr.is_null() {
         return;
     }
     unsafe {
-        let _ = Box::from_raw(ptr as *mut i32);
+        let base = (ptr as *mut i32).sub(1);
+        let len = *base as usize + 1;
+        drop(Box::from_raw(std::ptr::slice_from_raw_parts_mut(base, len)));
+    }
+}
+
+/// Run the body of an entry point returning a bare pointer: a panic gives a
+/// null pointer instead of unwinding into the caller.
+pub fn guard_raw<F: FnOnce() -> Vec<i32>>(body: F) -> *const i32 {
+    match catch_unwind(AssertUnwindSafe(body)) {
+        Ok(schedule) => into_raw_schedule(schedule),
+        Err(_) => std::ptr::null(),
+    }
+}
+
+/// Run the body of a checked entry point: the schedule and its length go to
+/// `out` / `out_len` (null and 0 on error) and the status is returned.
+pub fn guard_status<F: FnOnce() -> Result<Vec<i32>, i32>>(out: *mut *const i32, out_len: *mut i32, body: F) -> i32 {
+    if out.is_null() || out_len.is_null() {
+        return STATUS_INVALID_INPUT;
+    }
+    unsafe {
+        *out = std::ptr::null();
+        *out_len = 0;
+    }
+    match catch_unwind(AssertUnwindSafe(body)) {
+        Ok(Ok(schedule)) => unsafe {
+            *out_len = schedule.len() as i32;
+            *out = into_raw_schedule(schedule);
+            STATUS_OK
+        },
+        Ok(Err(status)) => status,
+        Err(_) => STATUS_PANIC,
+    }
+}
+
+/// STATUS_INVALID_INPUT if one of the counts (slots, lengths...) is negative.
+pub fn check_counts(counts: &[i32]) -> Result<(), i32> {
+    if counts.iter().any(|&count| count < 0) { Err(STATUS_INVALID_INPUT) } else { Ok(()) }
+}
+
+/// Length of a slot in hours: a 90 minute slot is 1.5 h.
+pub fn slot_hours(slot_minutes: i32) -> f32 {
+    slot_minutes as f32 / 60.0
+}
+
+/// Whole slots that fit in `hours`, a partial last slot is dropped.
+pub fn hours_to_slots(hours: f32, slot_minutes: i32) -> i32 {
+    (hours / slot_hours(slot_minutes)) as i32
+}
+
+/// Copy of a caller buffer, empty for a null pointer or a length <= 0.
+pub fn reconstruct_slice<T: Copy>(arr: *const T, len: i32) -> Vec<T> {
+    if arr.is_null() || len <= 0 {
+        return Vec::new();
     }
+    unsafe { std::slice::from_raw_parts(arr, len as usize) }.to_vec()
 }
 
 pub fn reconstruct_vec(arr: *const f32, len: i32) -> Vec<f32> {
-    let arr_slice = unsafe { std::slice::from_raw_parts(arr, len as usize) };
-    let array = arr_slice.iter().map(|&x| x).collect::<Vec<f32>>();
-    array
+    reconstruct_slice(arr, len)
 }
 
 pub fn reconstruct_subarray(flat: &[f32], lengths: &[usize]) -> Vec<Vec<f32>> {
@@ -31,6 +104,79 @@ pub fn reconstruct_subarray(flat: &[f32], lengths: &[usize]) -> Vec<Vec<f32>> {
     result
 }
 
+/// Bit matrix, one row of u64 words per row id (a subject or a slot).
+/// Bit `col % 64` of word `col / 64` is the column `col`, so membership is a
+/// single word operation and rows can be combined word by word.
+pub struct BitMatrix {
+    rows: usize,
+    words: usize,
+    bits: Vec<u64>,
+}
+
+impl BitMatrix {
+    pub fn new(rows: usize, cols: usize) -> BitMatrix {
+        let words = (cols + 63) / 64;
+        BitMatrix { rows, words, bits: vec![0; rows * words] }
+    }
+
+    /// Rows of `cols` bits packed in u64 words, as sent by the caller.
+    pub fn from_words(bits: *const u64, len: i32, cols: usize) -> BitMatrix {
+        let words = (cols + 63) / 64;
+        let bits = if words > 0 { reconstruct_slice(bits, len) } else { Vec::new() };
+        BitMatrix { rows: if words > 0 { bits.len() / words } else { 0 }, words, bits }
+    }
+
+    /// One row per list, the values of a list are the columns set.
+    pub fn from_lists(lists: &Vec<Vec<f32>>, cols: usize) -> BitMatrix {
+        let mut matrix = BitMatrix::new(lists.len(), cols);
+        for (row, values) in lists.iter().enumerate() {
+            for &value in values {
+                if value >= 0.0 && (value as usize) < cols {
+                    matrix.set(row, value as usize);
+                }
+            }
+        }
+        matrix
+    }
+
+    pub fn words(&self) -> usize {
+        self.words
+    }
+
+    /// Word `word` of the row, 0 for rows past the end (nothing set).
+    pub fn word(&self, row: usize, word: usize) -> u64 {
+        if row < self.rows { self.bits[row * self.words + word] } else { 0 }
+    }
+
+    pub fn get(&self, row: usize, col: usize) -> bool {
+        self.word(row, col / 64) & (1u64 << (col % 64)) != 0
+    }
+
+    pub fn set(&mut self, row: usize, col: usize) {
+        self.bits[row * self.words + col / 64] |= 1u64 << (col % 64);
+    }
+
+    pub fn clear(&mut self, row: usize, col: usize) {
+        self.bits[row * self.words + col / 64] &= !(1u64 << (col % 64));
+    }
+
+    pub fn or_word(&mut self, row: usize, word: usize, bits: u64) {
+        self.bits[row * self.words + word] |= bits;
+    }
+}
+
+/// Unavailability sent as flat slot list plus the length of each subject's list.
+pub fn reconstruct_unavailability(
+    unavailable: *const f32, unavailable_len: i32,
+    unavailable_sub: *const f32, unavailable_sub_len: i32,
+    total_slot: i32
+) -> BitMatrix {
+    let flat_unavailability = reconstruct_vec(unavailable, unavailable_len);
+    let subarray = reconstruct_vec(unavailable_sub, unavailable_sub_len)
+        .iter().map(|&x| x as usize).collect::<Vec<usize>>();
+    BitMatrix::from_lists(&reconstruct_subarray(&flat_unavailability, &subarray), total_slot as usize)
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
@@ -48,6 +194,34 @@ mod tests {
         assert_eq!(result, vec![1.1, 2.2, 3.3, 4.4]);
     }
 
+    #[test]
+    fn raw_schedule_test() {
+        for schedule in [vec![3, -1, 7], vec![]] {
+            let ptr = into_raw_schedule(schedule.clone());
+            assert_eq!(unsafe { std::slice::from_raw_parts(ptr, schedule.len()) }, &schedule[..]);
+            free_planning(ptr);
+        }
+    }
+
+    #[test]
+    fn guard_status_test() {
+        let mut out: *const i32 = std::ptr::null();
+        let mut out_len = -1;
+        assert_eq!(guard_status(&mut out, &mut out_len, || Ok(vec![1, 2])), STATUS_OK);
+        assert_eq!(unsafe { std::slice::from_raw_parts(out, out_len as usize) }, &[1, 2]);
+        free_planning(out);
+
+        assert_eq!(guard_status(&mut out, &mut out_len, || check_counts(&[3, -1]).map(|_| vec![])), STATUS_INVALID_INPUT);
+        assert!(out.is_null() && out_len == 0);
+        let status = guard_status(&mut out, &mut out_len, || {
+            let empty: Vec<i32> = Vec::new();
+            Ok(vec![empty[1]])
+        });
+        assert_eq!(status, STATUS_PANIC);
+        assert!(out.is_null());
+        assert!(reconstruct_vec(std::ptr::null(), 3).is_empty());
+    }
+
     #[test]
     fn reconstruct_subarray_test() {
         let flat = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0];
@@ -55,4 +229,30 @@ mod tests {
         let result = reconstruct_subarray(&flat, &lengths);
         assert_eq!(result, vec![vec![1.0, 2.0], vec![3.0], vec![4.0, 5.0, 6.0]]);
     }
-}
\ No newline at end of file
+
+    #[test]
+    fn bit_matrix_test() {
+        let mut matrix = BitMatrix::new(2, 130);
+        matrix.set(1, 129);
+        matrix.set(0, 3);
+        assert!(matrix.get(1, 129) && matrix.get(0, 3));
+        assert!(!matrix.get(0, 129) && !matrix.get(1, 3));
+        matrix.clear(1, 129);
+        assert!(!matrix.get(1, 129));
+        // Rows past the end have nothing set
+        assert!(!matrix.get(5, 3));
+    }
+
+    #[test]
+    fn bit_matrix_from_words_test() {
+        let words: Vec<u64> = vec![0b1010, 1 << 6, 0, 1];
+        let matrix = BitMatrix::from_words(words.as_ptr(), 4, 70);
+        assert_eq!(matrix.words(), 2);
+        assert!(matrix.get(0, 1) && matrix.get(0, 3) && matrix.get(0, 70));
+        assert!(matrix.get(1, 64));
+        assert!(!matrix.get(1, 0));
+
+        let lists = BitMatrix::from_lists(&vec![vec![1.0, 3.0, 70.0], vec![64.0]], 71);
+        assert_eq!((lists.word(0, 0), lists.word(0, 1), lists.word(1, 0), lists.word(1, 1)), (0b1010, 1 << 6, 0, 1));
+    }
+}
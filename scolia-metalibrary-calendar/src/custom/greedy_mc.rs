@@ -1,6 +1,5 @@
 use std::cmp::Ordering;
-use std::mem;
-use crate::basic_function::{reconstruct_subarray, reconstruct_vec};
+use crate::basic_function::{check_counts, guard_raw, guard_status, hours_to_slots, reconstruct_unavailability, reconstruct_vec, slot_hours, BitMatrix};
 use crate::heuristics::greedy::greedy_schedule;
 use crate::heuristics::min_conflicts::min_conflict_schedule;
 
@@ -13,48 +12,141 @@ pub extern "C" fn generate_greedy_mc_planning(
     hours_done: *const f32, hours_done_len: i32,
     total_hours: *const f32, total_hours_len: i32,
 ) -> *const i32 {
-    // 1. Constructs params
+    guard_raw(|| {
+        let all_unavailability = reconstruct_unavailability(unavailable, unavailable_len, unavailable_sub, unavailable_sub_len, total_slot);
+        greedy_mc_planning(total_slot, max_weekly_hours, slot_minutes, subjects, subjects_len,
+                           &all_unavailability, hours_done, hours_done_len, total_hours, total_hours_len)
+    })
+}
+
+/// Same as generate_greedy_mc_planning, unavailability packed as one row of
+/// ceil(total_slot / 64) u64 words per subject (see BitMatrix).
+/// Checked entry point: returns a status, the schedule goes to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_greedy_mc_planning_bits(
+    total_slot: i32, max_weekly_hours: f32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    hours_done: *const f32, hours_done_len: i32,
+    total_hours: *const f32, total_hours_len: i32,
+    out: *mut *const i32, out_len: *mut i32,
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, subjects_len, unavailable_len, hours_done_len, total_hours_len])?;
+        let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+        Ok(greedy_mc_planning(total_slot, max_weekly_hours, slot_minutes, subjects, subjects_len,
+                              &all_unavailability, hours_done, hours_done_len, total_hours, total_hours_len))
+    })
+}
 
-    let max_slot = max_weekly_hours / (slot_minutes / 60) as f32;
+fn greedy_mc_planning(
+    total_slot: i32, max_weekly_hours: f32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    all_unavailability: &BitMatrix,
+    hours_done: *const f32, hours_done_len: i32,
+    total_hours: *const f32, total_hours_len: i32,
+) -> Vec<i32> {
+    // 1. Constructs params
     let all_subjects: Vec<f32> = reconstruct_vec(subjects, subjects_len);
-    let flat_unavailability = reconstruct_vec(unavailable, unavailable_len);
-    let subarray = reconstruct_vec(unavailable_sub, unavailable_sub_len)
-        .iter().map(|&x| x as usize).collect::<Vec<usize>>();
-    let all_unavailability = reconstruct_subarray(&flat_unavailability, &subarray);
     let hours_done: Vec<f32> = reconstruct_vec(hours_done, hours_done_len);
     let total_hours: Vec<f32> = reconstruct_vec(total_hours, total_hours_len);
 
+    // 2. Generate the week
+    greedy_mc_week(total_slot, max_weekly_hours, slot_minutes,
+                   &all_subjects, all_unavailability, &hours_done, &total_hours)
+}
+
+/// One greedy_mc week: weekly hours from the hours done, greedy then min conflict.
+pub fn greedy_mc_week(
+    total_slot: i32, max_weekly_hours: f32, slot_minutes: i32,
+    all_subjects: &Vec<f32>, all_unavailability: &BitMatrix,
+    hours_done: &Vec<f32>, total_hours: &Vec<f32>,
+) -> Vec<i32> {
+    let max_slot = hours_to_slots(max_weekly_hours, slot_minutes) as f32;
     let cap_per_subject = 8.0;
 
     // GET HOURS TO do for each subjects
     let todos = calculate_weekly_subject_hours(
-        &all_subjects,
-        &total_hours,
-        &hours_done,
+        all_subjects,
+        total_hours,
+        hours_done,
         max_weekly_hours,
         cap_per_subject,
     );
     let slot_todo: Vec<i32> = todos.iter().map(|&val_hours| {
-        let hours_f64 = val_hours as f64;
-        let num_slots_f64 = hours_f64 / (slot_minutes / 60) as f64;
-        num_slots_f64 as i32
+        hours_to_slots(val_hours, slot_minutes)
     }).collect();
 
     let mut schedule: Vec<i32> = vec![-1; total_slot as usize];
 
-    // 2. Generate Greedy Planning
+    // Greedy Planning
     schedule = greedy_schedule(
-        &all_subjects, &todos,
+        all_subjects, &todos,
         slot_minutes, total_slot, max_slot,
-        &mut schedule, &all_unavailability);
+        &mut schedule, all_unavailability);
+
+    // Min conflict
+    min_conflict_schedule(&mut schedule, all_subjects, all_unavailability, &slot_todo, 1000)
+}
+
+/// Plan `weeks` consecutive weeks in one call. Each week is a greedy_mc week:
+/// its hours come from calculate_weekly_subject_hours on the hours done so far,
+/// then the hours actually scheduled that week are added to hours done.
+/// Unavailability is weekly (the same slots every week), packed as one row of
+/// ceil(total_slot / 64) u64 words per subject (see BitMatrix).
+/// - hours_done_out: hours done after the last week, one value per subject
+/// Checked entry point: returns a status, the weeks * total_slot subject ids
+/// (week after week, -1: empty) go to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_greedy_mc_horizon(
+    total_slot: i32, max_weekly_hours: f32, slot_minutes: i32, weeks: i32,
+    subjects: *const f32, subjects_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    hours_done: *const f32, hours_done_len: i32,
+    total_hours: *const f32, total_hours_len: i32,
+    hours_done_out: *mut f32,
+    out: *mut *const i32, out_len: *mut i32,
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, weeks, subjects_len, unavailable_len, hours_done_len, total_hours_len])?;
+        Ok(greedy_mc_horizon(total_slot, max_weekly_hours, slot_minutes, weeks, subjects, subjects_len,
+                             unavailable, unavailable_len, hours_done, hours_done_len,
+                             total_hours, total_hours_len, hours_done_out))
+    })
+}
+
+fn greedy_mc_horizon(
+    total_slot: i32, max_weekly_hours: f32, slot_minutes: i32, weeks: i32,
+    subjects: *const f32, subjects_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    hours_done: *const f32, hours_done_len: i32,
+    total_hours: *const f32, total_hours_len: i32,
+    hours_done_out: *mut f32,
+) -> Vec<i32> {
+    // 1. Constructs params
+    let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+    let all_subjects: Vec<f32> = reconstruct_vec(subjects, subjects_len);
+    let mut hours_done: Vec<f32> = reconstruct_vec(hours_done, hours_done_len);
+    let total_hours: Vec<f32> = reconstruct_vec(total_hours, total_hours_len);
 
-    // 3. Min conflict
-    schedule = min_conflict_schedule(&mut schedule, &all_subjects, &all_unavailability, &slot_todo, 1000);
+    // 2. One week after the other, hours done carried forward
+    let mut horizon: Vec<i32> = Vec::with_capacity(weeks as usize * total_slot as usize);
+    for _ in 0..weeks {
+        let schedule = greedy_mc_week(total_slot, max_weekly_hours, slot_minutes,
+                                      &all_subjects, &all_unavailability, &hours_done, &total_hours);
+        for &subject in schedule.iter() {
+            if subject >= 0 && (subject as usize) < hours_done.len() {
+                hours_done[subject as usize] += slot_hours(slot_minutes);
+            }
+        }
+        horizon.extend_from_slice(&schedule);
+    }
 
-    // 4. return schedule
-     let ptr= schedule.as_ptr();
-     mem::forget(schedule);
-     ptr
+    // 3. return horizon, hours done through the out param
+    if !hours_done_out.is_null() && !hours_done.is_empty() {
+        unsafe { std::slice::from_raw_parts_mut(hours_done_out, hours_done.len()) }.copy_from_slice(&hours_done);
+    }
+    horizon
 }
 
 pub fn calculate_weekly_subject_hours(
@@ -194,7 +286,7 @@ pub fn calculate_weekly_subject_hours(
 
 #[cfg(test)]
 mod tests {
-    use crate::basic_function::free_planning;
+    use crate::basic_function::{free_planning, STATUS_OK};
     use super::*;
 
     #[test]
@@ -263,10 +355,10 @@ mod tests {
         let slot_minutes = 90;
         let max_weekly_hours = 6.0; // 4 créneaux de 90 min = 6h
 
-        // Une seule matière avec 4h à faire
+        // Une seule matière avec 6h à faire
         let subjects = vec![0.0];
-        let total_hours = vec![10.0];
-        let hours_done = vec![6.0]; // reste 4h
+        let total_hours = vec![12.0];
+        let hours_done = vec![6.0]; // reste 6h
 
         // Un créneau d'indisponibilité : le slot 1
         let unavailable = vec![vec![1.0]];
@@ -302,4 +394,70 @@ mod tests {
         println!("Planning généré : {:?}", planning);
         assert_eq!(planning, expected);
     }
-}
\ No newline at end of file
+
+    #[test]
+    fn test_generate_greedy_mc_horizon() {
+        let total_slot = 7;
+        let weeks = 3;
+        let subjects = vec![0.0];
+        let total_hours = vec![12.0];
+        let hours_done = vec![3.0]; // reste 9h
+        let unavailable: Vec<u64> = vec![1 << 1];
+        let mut hours_done_out = vec![0.0];
+
+        let mut raw_ptr: *const i32 = std::ptr::null();
+        let mut raw_len = 0;
+        let status = generate_greedy_mc_horizon(
+            total_slot, 6.0, 90, weeks,
+            subjects.as_ptr(), subjects.len() as i32,
+            unavailable.as_ptr(), unavailable.len() as i32,
+            hours_done.as_ptr(), hours_done.len() as i32,
+            total_hours.as_ptr(), total_hours.len() as i32,
+            hours_done_out.as_mut_ptr(),
+            &mut raw_ptr, &mut raw_len
+        );
+        assert_eq!((status, raw_len), (STATUS_OK, weeks * total_slot));
+        let horizon: Vec<i32> = unsafe { std::slice::from_raw_parts(raw_ptr, raw_len as usize) }.to_vec();
+        free_planning(raw_ptr);
+
+        // 6h per week at most: 4 slots of 1.5h the first week, the 3h left the second, nothing the third
+        let per_week: Vec<usize> = horizon.chunks(total_slot as usize)
+            .map(|week| week.iter().filter(|&&x| x == 0).count()).collect();
+        assert_eq!(per_week, vec![4, 2, 0]);
+        assert!(horizon.chunks(total_slot as usize).all(|week| week[1] == -1));
+        assert_eq!(hours_done_out, vec![12.0]);
+    }
+
+    #[test]
+    fn test_greedy_mc_horizon_carries_slot_hours() {
+        // Every scheduled slot adds 1.5h to hours_done, never beyond hours_total
+        let (total_slot, weeks) = (8, 3);
+        let subjects = vec![0.0, 1.0];
+        let total_hours = vec![30.0, 30.0];
+        let hours_done = vec![0.0, 3.0];
+        let unavailable: Vec<u64> = vec![0, 0];
+        let mut hours_done_out = vec![0.0; 2];
+
+        let mut raw_ptr: *const i32 = std::ptr::null();
+        let mut raw_len = 0;
+        let status = generate_greedy_mc_horizon(
+            total_slot, 12.0, 90, weeks,
+            subjects.as_ptr(), subjects.len() as i32,
+            unavailable.as_ptr(), unavailable.len() as i32,
+            hours_done.as_ptr(), hours_done.len() as i32,
+            total_hours.as_ptr(), total_hours.len() as i32,
+            hours_done_out.as_mut_ptr(),
+            &mut raw_ptr, &mut raw_len
+        );
+        assert_eq!((status, raw_len), (STATUS_OK, weeks * total_slot));
+        let horizon: Vec<i32> = unsafe { std::slice::from_raw_parts(raw_ptr, raw_len as usize) }.to_vec();
+        free_planning(raw_ptr);
+
+        for subject in 0..2 {
+            let slots = horizon.iter().filter(|&&x| x == subject as i32).count();
+            assert!(slots > 0);
+            assert_eq!(hours_done_out[subject], hours_done[subject] + 1.5 * slots as f32);
+            assert!(hours_done_out[subject] <= total_hours[subject]);
+        }
+    }
+}
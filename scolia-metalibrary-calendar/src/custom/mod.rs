@@ -1 +1,3 @@
-mod greedy_mc;
\ No newline at end of file
+mod greedy_mc;
+mod repair;
+mod multi_class;
\ No newline at end of file
@@ -0,0 +1,378 @@
+use crate::basic_function::{check_counts, guard_status, reconstruct_slice, reconstruct_vec, hours_to_slots, BitMatrix, STATUS_INVALID_INPUT};
+
+/// Shared state of a school-wide solve.
+/// Subjects are global ids (all the classes' subjects, class after class).
+struct School {
+    total_slot: usize,
+    // First global subject id of each class, plus the total as last entry
+    class_start: Vec<usize>,
+    class_size: Vec<i32>,
+    teacher: Vec<i32>,
+    // Room ids sorted by capacity, so the first free room that fits is the smallest one
+    rooms_by_capacity: Vec<usize>,
+    room_capacity: Vec<i32>,
+    unavailable: BitMatrix,   // subject x slot
+    teacher_busy: BitMatrix,  // slot x teacher
+    room_busy: BitMatrix,     // slot x room
+    schedule: Vec<i32>,       // class x slot, global subject id or -1
+    rooms: Vec<i32>,          // class x slot, room id or -1
+}
+
+impl School {
+    fn class_of(&self, subject: usize) -> usize {
+        self.class_start.partition_point(|&start| start <= subject) - 1
+    }
+
+    fn teacher_free(&self, subject: usize, slot: usize) -> bool {
+        let teacher = self.teacher[subject];
+        teacher < 0 || !self.teacher_busy.get(slot, teacher as usize)
+    }
+
+    fn free_room(&self, class: usize, slot: usize) -> Option<i32> {
+        if self.room_capacity.is_empty() {
+            // No room given: rooms are not a constraint
+            return Some(-1);
+        }
+        self.rooms_by_capacity.iter()
+            .find(|&&room| self.room_capacity[room] >= self.class_size[class] && !self.room_busy.get(slot, room))
+            .map(|&room| room as i32)
+    }
+
+    fn can_place(&self, subject: usize, slot: usize) -> bool {
+        let class = self.class_of(subject);
+        self.schedule[class * self.total_slot + slot] == -1
+            && !self.unavailable.get(subject, slot)
+            && self.teacher_free(subject, slot)
+    }
+
+    fn place(&mut self, subject: usize, slot: usize, room: i32) {
+        let class = self.class_of(subject);
+        self.schedule[class * self.total_slot + slot] = subject as i32;
+        self.rooms[class * self.total_slot + slot] = room;
+        if self.teacher[subject] >= 0 {
+            self.teacher_busy.set(slot, self.teacher[subject] as usize);
+        }
+        if room >= 0 {
+            self.room_busy.set(slot, room as usize);
+        }
+    }
+
+    fn unplace(&mut self, class: usize, slot: usize) -> (usize, i32) {
+        let index = class * self.total_slot + slot;
+        let subject = self.schedule[index] as usize;
+        let room = self.rooms[index];
+        self.schedule[index] = -1;
+        self.rooms[index] = -1;
+        if self.teacher[subject] >= 0 {
+            self.teacher_busy.clear(slot, self.teacher[subject] as usize);
+        }
+        if room >= 0 {
+            self.room_busy.clear(slot, room as usize);
+        }
+        (subject, room)
+    }
+
+    /// First slot where the subject, its teacher, its class and a room are all free
+    fn place_first_fit(&mut self, subject: usize) -> bool {
+        let class = self.class_of(subject);
+        for slot in 0..self.total_slot {
+            if !self.can_place(subject, slot) {
+                continue;
+            }
+            if let Some(room) = self.free_room(class, slot) {
+                self.place(subject, slot, room);
+                return true;
+            }
+        }
+        false
+    }
+
+    /// Place the subject on a slot of its class taken by another lesson,
+    /// moving that lesson to a free slot of the class (one level ejection chain).
+    fn place_by_moving(&mut self, subject: usize) -> bool {
+        let class = self.class_of(subject);
+        for slot in 0..self.total_slot {
+            let other = self.schedule[class * self.total_slot + slot];
+            if other < 0 || other as usize == subject
+                || self.unavailable.get(subject, slot) || !self.teacher_free(subject, slot) {
+                continue;
+            }
+            let (other, room) = self.unplace(class, slot);
+            let target = (0..self.total_slot)
+                .filter(|&free_slot| free_slot != slot && self.can_place(other, free_slot))
+                .find_map(|free_slot| self.free_room(class, free_slot).map(|free_room| (free_slot, free_room)));
+            match target {
+                Some((free_slot, free_room)) => {
+                    self.place(other, free_slot, free_room);
+                    // The room of the moved lesson fits this class
+                    self.place(subject, slot, room);
+                    return true;
+                }
+                None => self.place(other, slot, room),
+            }
+        }
+        false
+    }
+}
+
+/// Solve every class at once, teachers and rooms being shared by all the classes.
+/// Returns the number of lessons (slots) that could not be placed.
+pub fn multi_class_schedule(
+    total_slot: usize,
+    class_start: Vec<usize>, class_max_slot: &Vec<i32>, class_size: Vec<i32>,
+    teacher: Vec<i32>, slot_todo: &Vec<i32>,
+    unavailable: BitMatrix, room_capacity: Vec<i32>,
+) -> (Vec<i32>, Vec<i32>, i32) {
+    let classes_len = class_start.len();
+    let subjects_len = teacher.len();
+    let teachers_len = teacher.iter().map(|&t| t + 1).max().unwrap_or(0).max(0) as usize;
+
+    let mut rooms_by_capacity: Vec<usize> = (0..room_capacity.len()).collect();
+    rooms_by_capacity.sort_by_key(|&room| room_capacity[room]);
+
+    let mut class_bounds = class_start.clone();
+    class_bounds.push(subjects_len);
+    let mut school = School {
+        total_slot,
+        class_start: class_bounds,
+        class_size,
+        teacher,
+        rooms_by_capacity,
+        room_busy: BitMatrix::new(total_slot, room_capacity.len()),
+        room_capacity,
+        unavailable,
+        teacher_busy: BitMatrix::new(total_slot, teachers_len),
+        schedule: vec![-1; classes_len * total_slot],
+        rooms: vec![-1; classes_len * total_slot],
+    };
+
+    // 1. Lessons to place: slot_todo of each subject, capped by the class weekly slots
+    // in subject priority order
+    let mut remaining: Vec<i32> = vec![0; subjects_len];
+    for class in 0..classes_len {
+        let mut budget = class_max_slot[class];
+        for subject in school.class_start[class]..school.class_start[class + 1] {
+            remaining[subject] = slot_todo[subject].min(budget).max(0);
+            budget -= remaining[subject];
+        }
+    }
+
+    // 2. Round robin over the classes, one lesson at a time, so that the first
+    // classes do not take all the shared teachers and rooms
+    let mut next_subject: Vec<usize> = school.class_start[..classes_len].to_vec();
+    let mut unplaced: Vec<usize> = Vec::new();
+    let mut active = true;
+    while active {
+        active = false;
+        for class in 0..classes_len {
+            let end = school.class_start[class + 1];
+            while next_subject[class] < end && remaining[next_subject[class]] == 0 {
+                next_subject[class] += 1;
+            }
+            if next_subject[class] == end {
+                continue;
+            }
+            active = true;
+            let subject = next_subject[class];
+            remaining[subject] -= 1;
+            if !school.place_first_fit(subject) {
+                unplaced.push(subject);
+            }
+        }
+    }
+
+    // 3. Second chance for the lessons left over, by moving a lesson of the same class
+    let mut unplaced_count = 0;
+    for subject in unplaced {
+        if !school.place_by_moving(subject) {
+            unplaced_count += 1;
+        }
+    }
+
+    // 4. Back to subject ids local to each class
+    for class in 0..classes_len {
+        let start = school.class_start[class] as i32;
+        for slot in 0..total_slot {
+            let index = class * total_slot + slot;
+            if school.schedule[index] >= 0 {
+                school.schedule[index] -= start;
+            }
+        }
+    }
+    (school.schedule, school.rooms, unplaced_count)
+}
+
+/// Schedule several classes in one call.
+/// - class_sub: number of subjects of each class, the subject arrays hold the
+///   subjects of every class one class after the other
+/// - class_max_hours / class_size: weekly hours and headcount of each class
+/// - teachers: teacher id of each subject, shared across classes (-1: none)
+/// - unavailable: one row of ceil(total_slot / 64) u64 words per subject (see BitMatrix)
+/// - room_capacity: capacity of each shared room, no room means no room constraint
+/// - rooms_out: room id of each class slot (-1: none), classes_len * total_slot values
+/// - unplaced: number of lessons that could not be placed
+/// Checked entry point: returns a status, the classes_len * total_slot subject
+/// ids (local to each class, -1: empty) go to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_multi_class_planning(
+    total_slot: i32, slot_minutes: i32,
+    class_sub: *const i32, class_sub_len: i32,
+    class_max_hours: *const f32, class_max_hours_len: i32,
+    class_size: *const i32, class_size_len: i32,
+    teachers: *const i32, teachers_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    room_capacity: *const i32, room_capacity_len: i32,
+    rooms_out: *mut i32, unplaced: *mut i32,
+    out: *mut *const i32, out_len: *mut i32,
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, class_sub_len, class_max_hours_len, class_size_len, teachers_len,
+                       todo_len, unavailable_len, room_capacity_len])?;
+        let subjects_per_class: Vec<i32> = reconstruct_slice(class_sub, class_sub_len);
+        check_counts(&subjects_per_class)?;
+        // One value per class, one per subject, and somewhere to write the rooms
+        let subjects_len: i32 = subjects_per_class.iter().sum();
+        if class_max_hours_len != class_sub_len || class_size_len != class_sub_len
+            || teachers_len != subjects_len || todo_len != subjects_len
+            || (rooms_out.is_null() && class_sub_len > 0 && total_slot > 0) {
+            return Err(STATUS_INVALID_INPUT);
+        }
+        Ok(multi_class_planning(total_slot, slot_minutes, &subjects_per_class, class_max_hours, class_max_hours_len,
+                                class_size, class_size_len, teachers, teachers_len, todo, todo_len,
+                                unavailable, unavailable_len, room_capacity, room_capacity_len, rooms_out, unplaced))
+    })
+}
+
+fn multi_class_planning(
+    total_slot: i32, slot_minutes: i32,
+    subjects_per_class: &Vec<i32>,
+    class_max_hours: *const f32, class_max_hours_len: i32,
+    class_size: *const i32, class_size_len: i32,
+    teachers: *const i32, teachers_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    room_capacity: *const i32, room_capacity_len: i32,
+    rooms_out: *mut i32, unplaced: *mut i32,
+) -> Vec<i32> {
+    // 1. Constructs params
+    let mut class_start: Vec<usize> = Vec::with_capacity(subjects_per_class.len());
+    let mut start = 0;
+    for &count in subjects_per_class {
+        class_start.push(start);
+        start += count as usize;
+    }
+    let class_max_slot: Vec<i32> = reconstruct_vec(class_max_hours, class_max_hours_len).iter()
+        .map(|&hours| hours_to_slots(hours, slot_minutes)).collect();
+    let class_size: Vec<i32> = reconstruct_slice(class_size, class_size_len);
+    let teacher: Vec<i32> = reconstruct_slice(teachers, teachers_len);
+    let slot_todo: Vec<i32> = reconstruct_vec(todo, todo_len).iter()
+        .map(|&hours| hours_to_slots(hours, slot_minutes)).collect();
+    let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+    let capacities: Vec<i32> = reconstruct_slice(room_capacity, room_capacity_len);
+
+    // 2. Solve
+    let (schedule, rooms, unplaced_count) = multi_class_schedule(
+        total_slot as usize, class_start, &class_max_slot, class_size,
+        teacher, &slot_todo, all_unavailability, capacities);
+
+    // 3. return schedule, rooms and unplaced through the out params
+    unsafe {
+        if !rooms.is_empty() {
+            std::slice::from_raw_parts_mut(rooms_out, rooms.len()).copy_from_slice(&rooms);
+        }
+        if !unplaced.is_null() {
+            *unplaced = unplaced_count;
+        }
+    }
+    schedule
+}
+
+#[cfg(test)]
+mod tests {
+    use crate::basic_function::{free_planning, STATUS_OK};
+    use super::*;
+
+    fn solve(class_sub: Vec<usize>, teacher: Vec<i32>, todo: Vec<i32>, unavailability: Vec<Vec<f32>>,
+             total_slot: usize, room_capacity: Vec<i32>) -> (Vec<i32>, Vec<i32>, i32) {
+        let mut class_start = Vec::new();
+        let mut start = 0;
+        for count in &class_sub {
+            class_start.push(start);
+            start += count;
+        }
+        let classes_len = class_sub.len();
+        multi_class_schedule(total_slot, class_start, &vec![100; classes_len], vec![20; classes_len],
+                             teacher, &todo, BitMatrix::from_lists(&unavailability, total_slot), room_capacity)
+    }
+
+    #[test]
+    fn test_shared_teacher_never_double_booked() {
+        // Two classes, one subject each, same teacher
+        let (schedule, _, unplaced) = solve(vec![1, 1], vec![0, 0], vec![2, 2], vec![vec![], vec![]], 4, vec![]);
+        assert_eq!(unplaced, 0);
+        for slot in 0..4 {
+            assert!(!(schedule[slot] == 0 && schedule[4 + slot] == 0));
+        }
+        assert_eq!(schedule.iter().filter(|&&s| s == 0).count(), 4);
+    }
+
+    #[test]
+    fn test_rooms_capacity_and_sharing() {
+        // Two classes of 20, one room of 10 and one of 30: only one class per slot
+        let (schedule, rooms, unplaced) = solve(vec![1, 1], vec![0, 1], vec![2, 2], vec![vec![], vec![]], 4, vec![10, 30]);
+        assert_eq!(unplaced, 0);
+        for slot in 0..4 {
+            assert!(schedule[slot] == -1 || schedule[4 + slot] == -1);
+        }
+        assert!(rooms.iter().all(|&room| room == -1 || room == 1));
+    }
+
+    #[test]
+    fn test_move_lesson_to_place_constrained_subject() {
+        // Class 0: subject 0 (first fit takes slot 0), subject 1 only available on slot 0
+        let (schedule, _, unplaced) = solve(vec![2], vec![0, 1], vec![1, 1], vec![vec![], vec![1.0]], 2, vec![]);
+        assert_eq!(unplaced, 0);
+        assert_eq!(schedule, vec![1, 0]);
+    }
+
+    #[test]
+    fn test_unplaced_when_teacher_overloaded() {
+        let (_, _, unplaced) = solve(vec![1, 1], vec![0, 0], vec![2, 2], vec![vec![], vec![]], 3, vec![]);
+        assert_eq!(unplaced, 1);
+    }
+
+    #[test]
+    fn test_generate_multi_class_planning() {
+        let class_sub = vec![1, 1];
+        let max_hours = vec![35.0, 35.0];
+        let class_size = vec![20, 20];
+        let teachers = vec![0, 0];
+        let todo = vec![3.0, 1.5];
+        // Slot 0 unavailable for the subject of class 0, one u64 word per subject
+        let unavailable: Vec<u64> = vec![1, 0];
+        let capacity = vec![30];
+        let mut rooms = vec![0; 6];
+        let mut unplaced = -1;
+
+        let mut data: *const i32 = std::ptr::null();
+        let mut data_len = 0;
+        let status = generate_multi_class_planning(3, 90,
+                                                 class_sub.as_ptr(), 2,
+                                                 max_hours.as_ptr(), 2,
+                                                 class_size.as_ptr(), 2,
+                                                 teachers.as_ptr(), 2,
+                                                 todo.as_ptr(), 2,
+                                                 unavailable.as_ptr(), unavailable.len() as i32,
+                                                 capacity.as_ptr(), 1,
+                                                 rooms.as_mut_ptr(), &mut unplaced,
+                                                 &mut data, &mut data_len);
+        assert_eq!((status, data_len), (STATUS_OK, 6));
+        let planning = unsafe { std::slice::from_raw_parts(data, 6) }.to_vec();
+        free_planning(data);
+
+        assert_eq!(unplaced, 0);
+        assert_eq!(planning, vec![-1, 0, 0, 0, -1, -1]);
+        assert_eq!(rooms, vec![-1, 0, 0, 0, -1, -1]);
+    }
+}
@@ -0,0 +1,148 @@
+use crate::basic_function::{check_counts, guard_raw, guard_status, hours_to_slots, reconstruct_slice, reconstruct_unavailability, reconstruct_vec, BitMatrix};
+
+#[unsafe(no_mangle)]
+pub extern "C" fn repair_planning(
+    total_slot: i32, slot_minutes: i32,
+    current: *const i32, current_len: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const f32, unavailable_len: i32,
+    unavailable_sub: *const f32, unavailable_sub_len: i32
+) -> *const i32 {
+    guard_raw(|| {
+        let all_unavailability = reconstruct_unavailability(unavailable, unavailable_len, unavailable_sub, unavailable_sub_len, total_slot);
+        repair(total_slot, slot_minutes, current, current_len, subjects, subjects_len, todo, todo_len, &all_unavailability)
+    })
+}
+
+/// Same as repair_planning, unavailability packed as one row of
+/// ceil(total_slot / 64) u64 words per subject (see BitMatrix).
+/// Checked entry point: returns a status, the schedule goes to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn repair_planning_bits(
+    total_slot: i32, slot_minutes: i32,
+    current: *const i32, current_len: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    out: *mut *const i32, out_len: *mut i32
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, current_len, subjects_len, todo_len, unavailable_len])?;
+        let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+        Ok(repair(total_slot, slot_minutes, current, current_len, subjects, subjects_len, todo, todo_len, &all_unavailability))
+    })
+}
+
+fn repair(
+    total_slot: i32, slot_minutes: i32,
+    current: *const i32, current_len: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    all_unavailability: &BitMatrix
+) -> Vec<i32> {
+    // 1. Constructs params
+    let current_schedule: Vec<i32> = reconstruct_slice(current, current_len);
+    let all_subjects: Vec<f32> = reconstruct_vec(subjects, subjects_len);
+    let hours_todo: Vec<f32> = reconstruct_vec(todo, todo_len);
+    let slot_todo: Vec<i32> = hours_todo.iter().map(|&val_hours| {
+        hours_to_slots(val_hours, slot_minutes)
+    }).collect();
+
+    // 2. Seed from the current planning, unknown subjects become empty slots
+    let mut schedule: Vec<i32> = vec![-1; total_slot as usize];
+    for (slot, &subject) in current_schedule.iter().take(total_slot as usize).enumerate() {
+        if subject >= 0 && (subject as usize) < slot_todo.len() {
+            schedule[slot] = subject;
+        }
+    }
+
+    // 3. Repair only the slots affected by the change
+    repair_schedule(&mut schedule, &all_subjects, all_unavailability, &slot_todo)
+}
+
+pub fn repair_schedule(schedule: &mut Vec<i32>, subjects: &Vec<f32>, all_unavailability: &BitMatrix, slot_todo: &Vec<i32>) -> Vec<i32> {
+    let mut slot_count_subject = vec![0; slot_todo.len()];
+
+    // 3.1 Free the slots that are now unavailable or over the subject's slot count,
+    // every other slot keeps its subject
+    for slot in 0..schedule.len() {
+        if schedule[slot] == -1 {
+            continue;
+        }
+        let subject_id = schedule[slot] as usize;
+        if all_unavailability.get(subject_id, slot) || slot_count_subject[subject_id] >= slot_todo[subject_id] {
+            schedule[slot] = -1;
+        } else {
+            slot_count_subject[subject_id] += 1;
+        }
+    }
+
+    // 3.2 Give the missing slots of each subject, in priority order, to free slots
+    for subject_id in subjects.iter().map(|&x| x as usize) {
+        if subject_id >= slot_todo.len() {
+            continue;
+        }
+        for slot in 0..schedule.len() {
+            if slot_count_subject[subject_id] >= slot_todo[subject_id] {
+                break;
+            }
+            if schedule[slot] != -1 || all_unavailability.get(subject_id, slot) {
+                continue;
+            }
+            schedule[slot] = subject_id as i32;
+            slot_count_subject[subject_id] += 1;
+        }
+    }
+    schedule.clone()
+}
+
+#[cfg(test)]
+mod tests {
+    use crate::basic_function::free_planning;
+    use crate::heuristics::min_conflicts::get_conflict;
+    use super::*;
+
+    fn call_repair(current: &Vec<i32>, todo: &Vec<f32>, unavailable: &Vec<Vec<f32>>) -> Vec<i32> {
+        let subjects: Vec<f32> = (0..todo.len()).map(|x| x as f32).collect();
+        let length: Vec<f32> = unavailable.iter().map(|inner_vec| inner_vec.len() as f32).collect();
+        let flat: Vec<f32> = unavailable.clone().into_iter().flatten().collect();
+
+        let data = repair_planning(current.len() as i32, 90,
+                                   current.as_ptr(), current.len() as i32,
+                                   subjects.as_ptr(), subjects.len() as i32,
+                                   todo.as_ptr(), todo.len() as i32,
+                                   flat.as_ptr(), flat.len() as i32,
+                                   length.as_ptr(), length.len() as i32);
+        let arr_slice = unsafe { std::slice::from_raw_parts(data, current.len()) };
+        let planning = arr_slice.to_vec();
+        free_planning(data);
+        planning
+    }
+
+    #[test]
+    fn test_repair_new_unavailability() {
+        let current = vec![0, 1, 0, -1, 1, -1, -1];
+        let unavailable = vec![vec![2.0], vec![]];
+        let planning = call_repair(&current, &vec![3.0, 3.0], &unavailable);
+
+        // Only the slot 2 moves, to the first free slot
+        assert_eq!(planning, vec![0, 1, -1, 0, 1, -1, -1]);
+        let (conflict_count, _) = get_conflict(&planning, &BitMatrix::from_lists(&unavailable, 7), &vec![2, 2]);
+        assert_eq!(conflict_count, 0);
+    }
+
+    #[test]
+    fn test_repair_less_hours() {
+        let current = vec![0, 1, 0, -1, 1, -1, -1];
+        let planning = call_repair(&current, &vec![1.5, 3.0], &vec![vec![], vec![]]);
+        assert_eq!(planning, vec![0, 1, -1, -1, 1, -1, -1]);
+    }
+
+    #[test]
+    fn test_repair_unchanged() {
+        let current = vec![0, 1, 0, -1, 1, -1, -1];
+        let planning = call_repair(&current, &vec![3.0, 3.0], &vec![vec![], vec![]]);
+        assert_eq!(planning, current);
+    }
+}
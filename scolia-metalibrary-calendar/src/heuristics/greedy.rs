@@ -1,5 +1,4 @@
-use std::mem;
-use crate::basic_function::{reconstruct_vec, reconstruct_subarray};
+use crate::basic_function::{check_counts, guard_raw, guard_status, hours_to_slots, reconstruct_vec, reconstruct_unavailability, BitMatrix};
 #[unsafe(no_mangle)]
 pub extern "C" fn generate_greedy_planning(
     total_slot: i32, max_hours: i32, slot_minutes: i32,
@@ -8,46 +7,68 @@ pub extern "C" fn generate_greedy_planning(
     unavailable: *const f32, unavailable_len: i32,
     unavailable_sub: *const f32, unavailable_sub_len: i32
 ) -> *const i32 {
+    guard_raw(|| {
+        let all_unavailability = reconstruct_unavailability(unavailable, unavailable_len, unavailable_sub, unavailable_sub_len, total_slot);
+        greedy_planning(total_slot, max_hours, slot_minutes, subjects, subjects_len, todo, todo_len, &all_unavailability)
+    })
+}
+
+/// Same as generate_greedy_planning, unavailability packed as one row of
+/// ceil(total_slot / 64) u64 words per subject (see BitMatrix).
+/// Checked entry point: returns a status, the schedule goes to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_greedy_planning_bits(
+    total_slot: i32, max_hours: i32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    out: *mut *const i32, out_len: *mut i32
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, subjects_len, todo_len, unavailable_len])?;
+        let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+        Ok(greedy_planning(total_slot, max_hours, slot_minutes, subjects, subjects_len, todo, todo_len, &all_unavailability))
+    })
+}
+
+fn greedy_planning(
+    total_slot: i32, max_hours: i32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    all_unavailability: &BitMatrix
+) -> Vec<i32> {
     let all_subjects: Vec<f32> = reconstruct_vec(subjects, subjects_len);
     let hours_todo: Vec<f32> = reconstruct_vec(todo, todo_len);
-    let max_slot = max_hours as f32 / (slot_minutes / 60) as f32;
-
-    let flat_unavailability = reconstruct_vec(unavailable, unavailable_len);
-    let subarray = reconstruct_vec(unavailable_sub, unavailable_sub_len)
-        .iter().map(|&x| x as usize).collect::<Vec<usize>>();
-    let all_unavailability = reconstruct_subarray(&flat_unavailability, &subarray);
+    let max_slot = hours_to_slots(max_hours as f32, slot_minutes) as f32;
 
     let mut schedule: Vec<i32> = vec![-1; total_slot as usize];
 
-    schedule = greedy_schedule(
+    greedy_schedule(
         &all_subjects, &hours_todo,
         slot_minutes, total_slot, max_slot,
-        &mut schedule, &all_unavailability);
-
-    let ptr= schedule.as_ptr();
-    mem::forget(schedule);
-    ptr
+        &mut schedule, all_unavailability)
 }
 
 pub fn greedy_schedule(
     subjects: &Vec<f32>,todos: &Vec<f32>,
     slot_minutes: i32, total_slot: i32, max_slot: f32,
-    schedule: &mut Vec<i32>, unavailability: &Vec<Vec<f32>>
+    schedule: &mut Vec<i32>, unavailability: &BitMatrix
 ) -> Vec<i32> {
     let all_slots: Vec<i32> = (0..total_slot).collect();
     for subject_id in subjects.iter().map(|&x| x as usize) {
-        let nb_slot: f32 = todos[subject_id] / (slot_minutes / 60) as f32;
+        let nb_slot = hours_to_slots(todos[subject_id], slot_minutes) as f32;
+        // Less than one slot to do: nothing to place (count would never reach 0)
+        if nb_slot <= 0.0 {
+            continue;
+        }
         let mut count: i32 = 0;
 
         for slot in all_slots.iter().map(|&x| x as usize) {
             if schedule[slot] != -1 {
                 continue;
             }
-            if let Some(inner_vec) = unavailability.get(subject_id) {
-                let slot_unavailable = slot as f32;
-                if inner_vec.contains(&slot_unavailable) {
-                    continue;
-                }
+            if unavailability.get(subject_id, slot) {
+                continue;
             }
             schedule[slot] = subject_id as i32;
             count += 1;
@@ -66,19 +87,20 @@ pub fn greedy_schedule(
 #[cfg(test)]
 mod tests {
     use super::*;
-    use crate::basic_function::free_planning;
+    use crate::basic_function::{free_planning, STATUS_INVALID_INPUT, STATUS_OK, STATUS_PANIC};
 
     #[test]
     fn generate_planning_test() {
         let planning = vec![0, -1, 0, 0, -1, -1, -1];
 
         let subjects = vec![0.0];
-        let todo = vec![4.0];
+        // 4 créneaux de 90 min, plafonnés à 3 par les 5h de la semaine
+        let todo = vec![6.0];
         let unavailable = vec![vec![1.0]];
         let length: Vec<f32> = unavailable.iter().map(|inner_vec| inner_vec.len() as f32).collect();
         let flat: Vec<f32> = unavailable.into_iter().flatten().collect();
 
-        let data = generate_greedy_planning(7, 3, 90,
+        let data = generate_greedy_planning(7, 5, 90,
                                      subjects.as_ptr(), subjects.len() as i32,
                                      todo.as_ptr(), todo.len() as i32,
                                      flat.as_ptr(), flat.len() as i32,
@@ -89,4 +111,58 @@ mod tests {
         free_planning(data);
         assert_eq!(planning, new_planning);
     }
-}
\ No newline at end of file
+
+    #[test]
+    fn generate_planning_less_than_one_slot_test() {
+        // 1h to do with 90 min slots: no slot, the week stays empty
+        let subjects = vec![0.0, 1.0];
+        let todo = vec![1.0, 3.0];
+        let schedule = greedy_schedule(&subjects, &todo, 90, 7, 23.0, &mut vec![-1; 7],
+                                       &BitMatrix::from_lists(&vec![vec![], vec![]], 7));
+        assert_eq!(schedule, vec![1, 1, -1, -1, -1, -1, -1]);
+    }
+
+    #[test]
+    fn generate_planning_bits_status_test() {
+        let subjects = vec![0.0];
+        // Subject 3 has no hours_todo: the panic is returned as a status
+        let wrong_subjects = vec![3.0];
+        let todo = vec![4.0];
+        let mut data: *const i32 = std::ptr::null();
+        let mut data_len = 0;
+        let status = generate_greedy_planning_bits(-7, 3, 90, subjects.as_ptr(), 1, todo.as_ptr(), 1,
+                                                   std::ptr::null(), 0, &mut data, &mut data_len);
+        assert_eq!((status, data.is_null()), (STATUS_INVALID_INPUT, true));
+        let status = generate_greedy_planning_bits(7, 3, 90, wrong_subjects.as_ptr(), 1, todo.as_ptr(), 1,
+                                                   std::ptr::null(), 0, &mut data, &mut data_len);
+        assert_eq!((status, data.is_null()), (STATUS_PANIC, true));
+        let status = generate_greedy_planning_bits(0, 3, 90, subjects.as_ptr(), 1, todo.as_ptr(), 1,
+                                                   std::ptr::null(), 0, &mut data, &mut data_len);
+        assert_eq!((status, data_len), (STATUS_OK, 0));
+        free_planning(data);
+    }
+
+    #[test]
+    fn generate_planning_bits_test() {
+        let planning = vec![0, -1, 0, 0, -1, -1, -1];
+
+        let subjects = vec![0.0];
+        let todo = vec![6.0];
+        // Slot 1 unavailable, one u64 word per subject
+        let unavailable: Vec<u64> = vec![1 << 1];
+
+        let mut data: *const i32 = std::ptr::null();
+        let mut data_len = 0;
+        let status = generate_greedy_planning_bits(7, 5, 90,
+                                     subjects.as_ptr(), subjects.len() as i32,
+                                     todo.as_ptr(), todo.len() as i32,
+                                     unavailable.as_ptr(), unavailable.len() as i32,
+                                     &mut data, &mut data_len);
+        assert_eq!((status, data_len), (STATUS_OK, 7));
+
+        let arr_slice = unsafe { std::slice::from_raw_parts(data, 7) };
+        let new_planning = arr_slice.iter().map(|&x| x).collect::<Vec<i32>>();
+        free_planning(data);
+        assert_eq!(planning, new_planning);
+    }
+}
@@ -1,6 +1,6 @@
-use std::mem;
+use std::time::{Duration, Instant};
 use rand::Rng;
-use crate::basic_function::{reconstruct_subarray, reconstruct_vec};
+use crate::basic_function::{check_counts, guard_raw, guard_status, hours_to_slots, reconstruct_unavailability, reconstruct_vec, BitMatrix};
 
 #[unsafe(no_mangle)]
 pub extern "C" fn generate_min_conflicts_planning(
@@ -10,20 +10,71 @@ pub extern "C" fn generate_min_conflicts_planning(
     unavailable: *const f32, unavailable_len: i32,
     unavailable_sub: *const f32, unavailable_sub_len: i32
 ) -> *const i32{
+    generate_min_conflicts_planning_budget(total_slot, slot_minutes, subjects, subjects_len, todo, todo_len,
+                                           unavailable, unavailable_len, unavailable_sub, unavailable_sub_len,
+                                           1000, 0, std::ptr::null_mut())
+}
+
+/// Same as generate_min_conflicts_planning, with the search budget: stops after
+/// max_iterations or time_budget_ms (<= 0: no time limit), the conflict count
+/// of the returned schedule goes to `conflicts` (may be null).
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_min_conflicts_planning_budget(
+    total_slot: i32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const f32, unavailable_len: i32,
+    unavailable_sub: *const f32, unavailable_sub_len: i32,
+    max_iterations: i32, time_budget_ms: i32, conflicts: *mut i32
+) -> *const i32{
+    guard_raw(|| {
+        let all_unavailability = reconstruct_unavailability(unavailable, unavailable_len, unavailable_sub, unavailable_sub_len, total_slot);
+        min_conflicts_planning(total_slot, slot_minutes, subjects, subjects_len, todo, todo_len,
+                               &all_unavailability, max_iterations, time_budget_ms, conflicts)
+    })
+}
+
+/// Same as generate_min_conflicts_planning, unavailability packed as one row
+/// of ceil(total_slot / 64) u64 words per subject (see BitMatrix).
+/// Checked entry point: returns a status, the schedule goes to `out` / `out_len`.
+#[unsafe(no_mangle)]
+pub extern "C" fn generate_min_conflicts_planning_bits(
+    total_slot: i32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    unavailable: *const u64, unavailable_len: i32,
+    max_iterations: i32, time_budget_ms: i32, conflicts: *mut i32,
+    out: *mut *const i32, out_len: *mut i32
+) -> i32 {
+    guard_status(out, out_len, || {
+        check_counts(&[total_slot, subjects_len, todo_len, unavailable_len])?;
+        let all_unavailability = BitMatrix::from_words(unavailable, unavailable_len, total_slot as usize);
+        Ok(min_conflicts_planning(total_slot, slot_minutes, subjects, subjects_len, todo, todo_len,
+                                  &all_unavailability, max_iterations, time_budget_ms, conflicts))
+    })
+}
+
+fn min_conflicts_planning(
+    total_slot: i32, slot_minutes: i32,
+    subjects: *const f32, subjects_len: i32,
+    todo: *const f32, todo_len: i32,
+    all_unavailability: &BitMatrix,
+    max_iterations: i32, time_budget_ms: i32, conflicts: *mut i32
+) -> Vec<i32> {
+    // Budget: stop after max_iterations or time_budget_ms (<= 0 means no time limit)
+    let deadline = if time_budget_ms > 0 {
+        Some(Instant::now() + Duration::from_millis(time_budget_ms as u64))
+    } else {
+        None
+    };
+
     // 1. Constructs params
     let all_subjects: Vec<f32> = reconstruct_vec(subjects, subjects_len);
     let hours_todo: Vec<f32> = reconstruct_vec(todo, todo_len);
     let slot_todo: Vec<i32> = hours_todo.iter().map(|&val_hours| {
-        let hours_f64 = val_hours as f64;
-        let num_slots_f64 = hours_f64 / (slot_minutes / 60) as f64;
-        num_slots_f64 as i32
+        hours_to_slots(val_hours, slot_minutes)
     }).collect();
 
-    let flat_unavailability = reconstruct_vec(unavailable, unavailable_len);
-    let subarray = reconstruct_vec(unavailable_sub, unavailable_sub_len)
-        .iter().map(|&x| x as usize).collect::<Vec<usize>>();
-    let all_unavailability = reconstruct_subarray(&flat_unavailability, &subarray);
-
     let mut schedule: Vec<i32> = vec![-1; total_slot as usize];
 
     // 2. Random the schedule
@@ -34,99 +85,136 @@ pub extern "C" fn generate_min_conflicts_planning(
     }
 
     // 3. Recherche
-    schedule = min_conflict_schedule(&mut schedule, &all_subjects, &all_unavailability, &slot_todo, 1000);
+    let (best_schedule, best_conflicts) = min_conflict_schedule_budget(
+        &mut schedule, &all_subjects, all_unavailability, &slot_todo,
+        max_iterations.max(0) as usize, deadline);
+    schedule = best_schedule;
+    if !conflicts.is_null() {
+        unsafe { *conflicts = best_conflicts; }
+    }
+
+    schedule
+}
 
-    // return schedule
-    let ptr= schedule.as_ptr();
-    mem::forget(schedule);
-    ptr
+pub fn min_conflict_schedule(schedule: &mut Vec<i32>, subjects: &Vec<f32>, all_unavailability: &BitMatrix, slot_todo: &Vec<i32>, iteration: usize) -> Vec<i32>{
+    min_conflict_schedule_budget(schedule, subjects, all_unavailability, slot_todo, iteration, None).0
 }
 
-pub fn min_conflict_schedule(schedule: &mut Vec<i32>, subjects: &Vec<f32>, all_unavailability: &Vec<Vec<f32>>, slot_todo: &Vec<i32>, iteration: usize) -> Vec<i32>{
+/// Min-conflicts search with an iteration and time budget.
+/// Anytime: returns the best schedule seen and its conflict count, whenever it stops.
+pub fn min_conflict_schedule_budget(
+    schedule: &mut Vec<i32>, subjects: &Vec<f32>, all_unavailability: &BitMatrix, slot_todo: &Vec<i32>,
+    iteration: usize, deadline: Option<Instant>
+) -> (Vec<i32>, i32) {
     let mut rng = rand::rng();
+    let mut best_schedule = schedule.clone();
+    let mut best_conflicts = i32::MAX;
+
+    let mut possible_subjects: Vec<i32> =  subjects.iter().map(|&s| s as i32).collect();
+    possible_subjects.push(-1);
+
     for _ in 0..iteration {
+        if deadline.is_some_and(|limit| Instant::now() >= limit) {
+            break;
+        }
         // 3.1 count conflict if == 0 then break
-        let (conflict_count, conflict_index) = get_conflict(schedule.clone(), all_unavailability.clone(), slot_todo.clone());
-        if conflict_count != 0 {
-            // Choose a random one, get the best value for slots with fewer conflicts & if equal rand
-            let random_index = rng.random_range(0..conflict_count as usize);
-
-            let conflict_pos = conflict_index[random_index];
-            let mut best_value_for_chosen_variable = schedule[random_index];
-            let mut min_conflicts_count = conflict_count;
-            let mut tied_values = Vec::new(); // Pour gérer les égalités, on choisit aléatoirement parmi elles
-
-            let mut possible_subjects: Vec<i32> =  subjects.iter().map(|&s| s as i32).collect();
-            possible_subjects.push(-1);
-
-            for subject_index in 0..possible_subjects.len() {
-
-                let temp_subject = possible_subjects[subject_index] as i32;
-                let mut new_schedule = schedule.clone();
-                new_schedule[conflict_pos] = temp_subject;
-
-                let (new_conflict_count, _) = get_conflict(
-                    new_schedule.clone(),
-                    all_unavailability.clone(),
-                    slot_todo.clone()
-                );
-                if new_conflict_count < min_conflicts_count {
-                    min_conflicts_count = new_conflict_count;
-                    best_value_for_chosen_variable = temp_subject;
-                    tied_values = vec![best_value_for_chosen_variable];
-                }else if new_conflict_count == min_conflicts_count {
-                    tied_values.push(temp_subject);
-                }
-            }
-            if tied_values.len() > 0 {
-                let random_i = rng.random_range(0..tied_values.len());
-                schedule[conflict_pos] = tied_values[random_i];
-            }else {
-                schedule[conflict_pos] = best_value_for_chosen_variable;
+        let (conflict_count, conflict_index) = get_conflict(schedule, all_unavailability, slot_todo);
+        if conflict_count < best_conflicts {
+            best_conflicts = conflict_count;
+            best_schedule = schedule.clone();
+        }
+        if conflict_count == 0 {
+            break;
+        }
+        // Choose a random one, get the best value for slots with fewer conflicts & if equal rand
+        // (a slot can hold several conflicts, pick among the conflicted slots)
+        let random_index = rng.random_range(0..conflict_index.len());
+
+        let conflict_pos = conflict_index[random_index];
+        let current_subject = schedule[conflict_pos];
+        let mut best_value_for_chosen_variable = current_subject;
+        let mut min_conflicts_count = conflict_count;
+        let mut tied_values = Vec::new(); // Pour gérer les égalités, on choisit aléatoirement parmi elles
+
+        for &temp_subject in possible_subjects.iter() {
+            // Try the value in place, the slot is restored after the loop
+            schedule[conflict_pos] = temp_subject;
+            let (new_conflict_count, _) = get_conflict(schedule, all_unavailability, slot_todo);
+            if new_conflict_count < min_conflicts_count {
+                min_conflicts_count = new_conflict_count;
+                best_value_for_chosen_variable = temp_subject;
+                tied_values = vec![best_value_for_chosen_variable];
+            }else if new_conflict_count == min_conflicts_count {
+                tied_values.push(temp_subject);
             }
         }
+        schedule[conflict_pos] = current_subject;
+        if tied_values.len() > 0 {
+            let random_i = rng.random_range(0..tied_values.len());
+            schedule[conflict_pos] = tied_values[random_i];
+        }else {
+            schedule[conflict_pos] = best_value_for_chosen_variable;
+        }
     }
-    schedule.clone()
+    // The last move has not been counted yet
+    let (conflict_count, _) = get_conflict(schedule, all_unavailability, slot_todo);
+    if conflict_count < best_conflicts {
+        best_conflicts = conflict_count;
+        best_schedule = schedule.clone();
+    }
+    (best_schedule, best_conflicts)
 }
 
-fn get_conflict(schedule: Vec<i32>, unavailable: Vec<Vec<f32>>, todos: Vec<i32>) -> (i32, Vec<usize>) {
+/// Conflicts of a schedule: slots given to an unavailable subject, and slots
+/// over the slot count of their subject.
+/// Unavailability conflicts are found word by word, ANDing the slots of each
+/// subject with its unavailable slots.
+pub fn get_conflict(schedule: &Vec<i32>, unavailable: &BitMatrix, todos: &Vec<i32>) -> (i32, Vec<usize>) {
     let mut  conflict_count = 0;
     let mut slot_count_subject = vec![0; todos.len()];
-    let mut index_conflicts: Vec<usize> = Vec::new();
+    let mut scheduled = BitMatrix::new(todos.len(), schedule.len());
+    let mut conflicted = BitMatrix::new(1, schedule.len());
 
     for z in 0..schedule.len() {
-        // unavailability
-        for i in 0..unavailable.len() {
-            for j in 0..unavailable[i].len() {
-                if z == unavailable[i][j] as usize && schedule[z] == j as i32 {
-                    conflict_count += 1;
-                    // Get list of conflicted slots
-                    if !index_conflicts.contains(&z) {
-                        index_conflicts.push(z);
-                    }
-                }
-            }
+        if schedule[z] == -1 {
+            continue;
         }
+        let subject = schedule[z] as usize;
+        scheduled.set(subject, z);
         // max slot per subjects
-        if schedule[z] != -1 {
-            slot_count_subject[schedule[z] as usize] += 1;
-            // Get list of conflicted slots
-            if slot_count_subject[schedule[z] as usize] > todos[schedule[z] as usize] {
-                conflict_count += 1;
-                // Get list of conflicted slots
-                if !index_conflicts.contains(&z) {
-                    index_conflicts.push(z);
-                }
+        slot_count_subject[subject] += 1;
+        if slot_count_subject[subject] > todos[subject] {
+            conflict_count += 1;
+            conflicted.set(0, z);
+        }
+    }
+
+    // unavailability
+    for subject in 0..todos.len() {
+        for word in 0..scheduled.words() {
+            let hits = scheduled.word(subject, word) & unavailable.word(subject, word);
+            if hits != 0 {
+                conflict_count += hits.count_ones() as i32;
+                conflicted.or_word(0, word, hits);
             }
         }
     }
 
+    // Get list of conflicted slots
+    let mut index_conflicts: Vec<usize> = Vec::new();
+    for word in 0..conflicted.words() {
+        let mut bits = conflicted.word(0, word);
+        while bits != 0 {
+            index_conflicts.push(word * 64 + bits.trailing_zeros() as usize);
+            bits &= bits - 1;
+        }
+    }
     (conflict_count, index_conflicts)
 }
 
 #[cfg(test)]
 mod tests {
-    use crate::basic_function::free_planning;
+    use crate::basic_function::{free_planning, STATUS_OK};
     use super::*;
 
     #[test]
@@ -136,9 +224,9 @@ mod tests {
         let unavailable = vec![vec![1.0]];
 
         let (conflict_count, index_conflicts) = get_conflict(
-            planning.clone(),
-            unavailable.clone(),
-            todo.clone()
+            &planning,
+            &BitMatrix::from_lists(&unavailable, planning.len()),
+            &todo
         );
         assert_eq!(conflict_count, 2);
         assert_eq!(index_conflicts, vec![1, 5]);
@@ -152,16 +240,90 @@ mod tests {
         let length: Vec<f32> = unavailable.iter().map(|inner_vec| inner_vec.len() as f32).collect();
         let flat: Vec<f32> = unavailable.into_iter().flatten().collect();
 
-        let data = generate_min_conflicts_planning(7, 90,
+        let mut conflicts: i32 = -1;
+        let data = generate_min_conflicts_planning_budget(7, 90,
                                             subjects.as_ptr(), subjects.len() as i32,
                                             todo.as_ptr(), todo.len() as i32,
                                             flat.as_ptr(), flat.len() as i32,
-                                            length.as_ptr(), length.len() as i32);
+                                            length.as_ptr(), length.len() as i32,
+                                            1000, 0, &mut conflicts);
         let arr_slice = unsafe { std::slice::from_raw_parts(data, 7) };
         let new_planning = arr_slice.iter().map(|&x| x).collect::<Vec<i32>>();
         let count_zeros_success = new_planning.iter().filter(|&&x| x == 0).count();
         free_planning(data);
         assert_eq!(new_planning[1], -1, "La valeur à l'index 1 n'est pas 0.");
         assert!(count_zeros_success <= 4, "Le nombre de zéros n'est pas inférieur à 4.");
+        assert_eq!(conflicts, 0);
     }
-}
\ No newline at end of file
+
+    #[test]
+    fn test_generate_min_conflicts_legacy() {
+        // Historic signature: 1000 iterations, no time limit, no conflict count
+        let subjects = vec![0.0];
+        let todo = vec![4.0];
+        let flat = vec![1.0];
+        let length = vec![1.0];
+        let data = generate_min_conflicts_planning(7, 90,
+                                            subjects.as_ptr(), subjects.len() as i32,
+                                            todo.as_ptr(), todo.len() as i32,
+                                            flat.as_ptr(), flat.len() as i32,
+                                            length.as_ptr(), length.len() as i32);
+        let new_planning = unsafe { std::slice::from_raw_parts(data, 7) }.to_vec();
+        free_planning(data);
+        assert_eq!(new_planning[1], -1);
+    }
+
+    #[test]
+    fn test_min_conflict_schedule_budget_keeps_best() {
+        // Already conflict free: nothing to search, the schedule is returned as is
+        let mut schedule = vec![0, -1, 0, 0, -1, 0, -1];
+        let (best, conflicts) = min_conflict_schedule_budget(
+            &mut schedule, &vec![0.0], &BitMatrix::from_lists(&vec![vec![1.0]], 7), &vec![4], 1000, None);
+        assert_eq!(best, vec![0, -1, 0, 0, -1, 0, -1]);
+        assert_eq!(conflicts, 0);
+
+        // No iteration allowed: the seed is the best schedule seen
+        let mut schedule = vec![0, 0, 0, 0, 0, 0, 0];
+        let (best, conflicts) = min_conflict_schedule_budget(
+            &mut schedule, &vec![0.0], &BitMatrix::from_lists(&vec![vec![1.0]], 7), &vec![4], 0, None);
+        assert_eq!(best, vec![0, 0, 0, 0, 0, 0, 0]);
+        assert_eq!(conflicts, 4);
+    }
+
+    #[test]
+    fn test_get_conflict_across_words() {
+        // Slots 64 and 70 are in the second word
+        let mut planning = vec![-1; 80];
+        planning[3] = 0;
+        planning[64] = 0;
+        planning[70] = 1;
+        let unavailable = BitMatrix::from_lists(&vec![vec![64.0], vec![70.0, 3.0]], 80);
+
+        let (conflict_count, index_conflicts) = get_conflict(&planning, &unavailable, &vec![1, 1]);
+        // Slot 64: unavailable and over the slot count of subject 0, slot 70: unavailable
+        assert_eq!(conflict_count, 3);
+        assert_eq!(index_conflicts, vec![64, 70]);
+    }
+
+    #[test]
+    fn test_generate_min_conflicts_bits() {
+        let subjects = vec![0.0];
+        let todo = vec![4.0];
+        let unavailable: Vec<u64> = vec![1 << 1];
+
+        let mut conflicts: i32 = -1;
+        let mut data: *const i32 = std::ptr::null();
+        let mut data_len = 0;
+        let status = generate_min_conflicts_planning_bits(7, 90,
+                                            subjects.as_ptr(), subjects.len() as i32,
+                                            todo.as_ptr(), todo.len() as i32,
+                                            unavailable.as_ptr(), unavailable.len() as i32,
+                                            1000, 0, &mut conflicts, &mut data, &mut data_len);
+        assert_eq!((status, data_len), (STATUS_OK, 7));
+        let arr_slice = unsafe { std::slice::from_raw_parts(data, 7) };
+        let new_planning = arr_slice.to_vec();
+        free_planning(data);
+        assert_eq!(new_planning[1], -1);
+        assert_eq!(conflicts, 0);
+    }
+}